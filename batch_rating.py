@@ -0,0 +1,160 @@
+# batch_rating.py
+# 批量评级：对按列存放的基础指标（每个指标一个 NumPy 数组）一次性计算全部视频的复合分和评级，
+# 并可对一组阈值设置做 what-if 扫描，毫秒级给出每组设置下的 S/A/B/C/D 分布。
+# 结果与 step3 中 VideoScorer.compute_composite_scores / decide_rating 的逐个计算完全一致
+# （包括 round(x, 2) 的舍入和 800/1500 字的字数限制）。
+#
+# 直接运行本文件会用随机指标和随机阈值与逐个计算的结果做等价性自检：
+#     python batch_rating.py
+
+import numpy as np
+
+METRIC_COLUMNS = (
+    'density_virtual', 'density_logic', 'density_question', 'density_firstperson',
+    'vocab_richness', 'density_propernoun', 'length_penalty', 'total_chars'
+)
+
+# 评级编号与名称，编号顺序即 decide_rating 中判断的先后顺序
+RATING_LABELS = ('S', 'A(体验)', 'A(分析)', 'B(资讯)', 'B(一般)', 'C', 'D')
+S, A_EXPERIENCE, A_ANALYSIS, B_INFO, B_GENERAL, C, D = range(len(RATING_LABELS))
+GRADES = ('S', 'A', 'B', 'C', 'D')  # 分布统计时 A(体验)/A(分析)、B(资讯)/B(一般) 合并
+
+# 与 VideoScorer 中 .get() 的默认值保持一致
+DEFAULT_WEIGHTS = {
+    'propernoun_weight': 0.8, 'richness_weight': 100, 'question_weight': 2.0,
+    'logic_weight': 0.5, 'firstperson_weight': 10
+}
+DEFAULT_THRESHOLDS = {
+    'S_rational_min': 5.0, 'S_info_min': 50, 'S_chars_min': 12000, 'A_experience_min': 30,
+    'A_rational_min': 3.0, 'A_info_min': 40, 'B_info_high': 50, 'B_info_low': 30, 'C_info_min': 15
+}
+
+
+def metrics_to_columns(metrics_list):
+    """把 calculate_basic_metrics 返回的字典列表转换为按列存放的表 {指标名: float64 数组}"""
+    return {
+        name: np.array([m[name] for m in metrics_list], dtype=np.float64)
+        for name in METRIC_COLUMNS
+    }
+
+
+def round2(values):
+    """
+    与 Python 内置 round(x, 2) 逐元素一致的舍入。
+    np.round 先乘 100 再取整，乘法误差会让恰好落在 .5 附近的值舍入方向与 round() 不同；
+    这些“临界”元素（数量极少）回退到内置 round 逐个计算。
+    """
+    scaled = values * 100
+    result = np.round(scaled) / 100
+    ambiguous = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    for i in np.flatnonzero(ambiguous):
+        result[i] = round(float(values[i]), 2)
+    return result
+
+
+def composite_scores(columns, weights=None):
+    """批量计算三个复合维度分，运算顺序与 compute_composite_scores 相同以保证浮点结果一致"""
+    w = dict(DEFAULT_WEIGHTS, **(weights or {}))
+    info = (
+        columns['density_propernoun'] * w['propernoun_weight'] +
+        columns['vocab_richness'] * w['richness_weight']
+    ) * columns['length_penalty']
+    rational = (
+        columns['density_question'] * w['question_weight'] +
+        columns['density_logic'] * w['logic_weight']
+    )
+    experience = columns['density_firstperson'] * w['firstperson_weight']
+    return {
+        'info_score': round2(info),
+        'rational_score': round2(rational),
+        'experience_score': round2(experience)
+    }
+
+
+def ratings(scores, total_chars, thresholds=None):
+    """批量决策树评级，返回评级编号数组（见 RATING_LABELS）"""
+    th = dict(DEFAULT_THRESHOLDS, **(thresholds or {}))
+    info = scores['info_score']
+    rational = scores['rational_score']
+    experience = scores['experience_score']
+    temp = np.select(
+        [
+            (rational >= th['S_rational_min']) & (info >= th['S_info_min']) & (total_chars >= th['S_chars_min']),
+            experience >= th['A_experience_min'],
+            (rational >= th['A_rational_min']) & (info >= th['A_info_min']),
+            info >= th['B_info_high'],
+            info >= th['B_info_low'],
+            info >= th['C_info_min'],
+        ],
+        [S, A_EXPERIENCE, A_ANALYSIS, B_INFO, B_GENERAL, C],
+        default=D
+    )
+    # 字数限制调整：不足 800 字一律 D；不足 1500 字时 S/A/B 降为 C
+    temp = np.where((total_chars < 1500) & (temp <= B_GENERAL), C, temp)
+    return np.where(total_chars < 800, D, temp)
+
+
+def rating_labels(codes):
+    return [RATING_LABELS[c] for c in codes]
+
+
+def distribution(codes):
+    """统计 S/A/B/C/D 各档数量"""
+    counts = np.bincount(codes, minlength=len(RATING_LABELS))
+    return {
+        'S': int(counts[S]),
+        'A': int(counts[A_EXPERIENCE] + counts[A_ANALYSIS]),
+        'B': int(counts[B_INFO] + counts[B_GENERAL]),
+        'C': int(counts[C]),
+        'D': int(counts[D]),
+    }
+
+
+def sweep(columns, threshold_grid, weights=None):
+    """
+    对每组阈值设置（相对 DECISION_THRESHOLDS 的覆盖项）计算评级分布，返回 [(设置, 分布), ...]。
+    复合分与阈值无关，只计算一次。
+    """
+    from config import DECISION_THRESHOLDS
+    scores = composite_scores(columns, weights)
+    chars = columns['total_chars']
+    results = []
+    for overrides in threshold_grid:
+        codes = ratings(scores, chars, dict(DECISION_THRESHOLDS, **overrides))
+        results.append((overrides, distribution(codes)))
+    return results
+
+
+def _self_check(rounds=200, size=500, seed=0):
+    """随机指标（含临界的 .xx5、阈值边界和字数边界）与逐个计算的结果比对"""
+    import random
+    from step3_scorer import VideoScorer
+
+    rng = random.Random(seed)
+    edges = [0.0, 0.125, 0.375, 2.675, 1.005, 0.285, 0.5, 1.5]
+    for _ in range(rounds):
+        metrics_list = []
+        for _ in range(size):
+            chars = rng.choice([0, 799, 800, 1499, 1500, 11999, 12000, rng.randint(1, 30000)])
+            m = {name: rng.choice(edges + [rng.uniform(0, 80)]) for name in METRIC_COLUMNS}
+            m['vocab_richness'] = rng.choice([0.5, 0.125, rng.random()])
+            m['length_penalty'] = min(1.0, chars / 1000)
+            m['total_chars'] = chars
+            metrics_list.append(m)
+        scorer = VideoScorer()
+        scorer.weights = {k: rng.choice([v, round(rng.uniform(0, 2) * v, 3)]) for k, v in DEFAULT_WEIGHTS.items()}
+        scorer.thresholds = {k: rng.choice([v, round(rng.uniform(0.5, 1.5) * v, 1)]) for k, v in DEFAULT_THRESHOLDS.items()}
+
+        columns = metrics_to_columns(metrics_list)
+        scores = composite_scores(columns, scorer.weights)
+        codes = ratings(scores, columns['total_chars'], scorer.thresholds)
+        for i, m in enumerate(metrics_list):
+            expected = scorer.compute_composite_scores(m)
+            actual = {k: float(v[i]) for k, v in scores.items()}
+            assert actual == expected, (m, actual, expected)
+            assert RATING_LABELS[codes[i]] == scorer.decide_rating(expected, m), (m, expected)
+    print(f"批量评级等价性自检通过（{rounds} 组 × {size} 个视频）")
+
+
+if __name__ == "__main__":
+    _self_check()
@@ -5,18 +5,23 @@ import os
 
 # ==================== 路径配置 ====================
 SUBTITLE_DIR = "./data/subtitles"          # 字幕文件存放目录（音频转写或下载的字幕）
+RESULT_DB_PATH = "./data/results.db"       # 评分与审核结果库（step3 写入、step4 更新，Excel 由它导出）
 MODEL_PATH = os.getenv("WHISPER_MODEL_PATH", r"C:\useful\models\faster-whisper-small")
 # ==================== 音频/字幕目录配置 ====================
 AUDIO_DIR = "./data/audios"          # 下载的音频文件存放目录
 
 # ==================== 语音识别设备配置 ====================
-DEVICE = "cuda"                       # 可选 "cuda" 或 "cpu"
-COMPUTE_TYPE = "float16"               # GPU 推荐 "float16"，CPU 推荐 "int8"
+DEVICE = os.getenv("WHISPER_DEVICE", "auto")               # 可选 "auto"、"cuda" 或 "cpu"，auto 启动时自动检测 GPU
+COMPUTE_TYPE = os.getenv("WHISPER_COMPUTE_TYPE", "auto")   # auto：GPU 用 "float16"，CPU 用 "int8"
+CPU_THREADS_PER_WORKER = 4             # CPU 模式下每个模型实例分到的线程数（据此按核心数决定实例数）
+CUDA_BIN_PATH = r"C:\Program Files\NVIDIA GPU Computing Toolkit\CUDA\v12.0\bin"  # Windows 下的 CUDA 路径（存在时才加入 PATH）
 # ==================== B站爬虫配置 ====================
 BILIBILI_HEADERS = {
     "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
     "Referer": "https://www.bilibili.com"
 }
+BILIBILI_API_BASE = os.getenv("BILIBILI_API_BASE", "https://api.bilibili.com")  # 可指向本地测试服务器
+BILIBILI_SESSDATA = os.getenv("BILIBILI_SESSDATA", "")  # 登录 Cookie，获取 AI 字幕通常需要
 
 # ==================== 评分体系配置 ====================
 
@@ -29,6 +34,11 @@ LOGIC_WORDS = ['但是', '然而', '另一方面', '尽管如此', '不过']
 # 专有名词过滤词（常见的口语/通用词，不计入专有名词）
 EXCLUDE_PHRASES = ['什么', '如何', '这个', '可以', '就是', '那个', '我们', '他们', '一个', '没有', '不是']
 
+# jieba 分词词典：预构建的前缀词典缓存放在项目数据目录，按词典内容哈希命名
+JIEBA_CACHE_DIR = "./data/jieba_cache"
+# 领域专有名词用户词典（jieba 用户词典格式：每行“词语 [词频] [词性]”），会一并编译进缓存
+JIEBA_USER_DICTS = []
+
 # 复合维度权重（用于计算信息密度分、理性思辨分、体验思辨分）
 SCORE_WEIGHTS = {
     'propernoun_weight': 0.8,      # 专有名词密度权重
@@ -64,4 +74,5 @@ DECISION_THRESHOLDS = {
 
 # ==================== DeepSeek API 配置 ====================
 DEEPSEEK_API_KEY = os.getenv("DEEPSEEK_API_KEY", "sk-34ee930b3f264152af50f8afcd348388")  # 建议从环境变量读取
-DEEPSEEK_API_URL = "https://api.deepseek.com/v1/chat/completions"
\ No newline at end of file
+DEEPSEEK_API_URL = os.getenv("DEEPSEEK_API_URL", "https://api.deepseek.com/v1/chat/completions")  # 可指向本地模拟服务（tools/mock_deepseek_server.py）
+DEEPSEEK_TOKENIZER_FILE = os.getenv("DEEPSEEK_TOKENIZER_FILE", "")  # DeepSeek 的 tokenizer.json，留空则按字符数估算 token
\ No newline at end of file
@@ -0,0 +1,163 @@
+# jieba_cache.py
+# jieba 快速启动：
+#   1. 延迟加载：导入本模块不会导入 jieba，第一次分词时才加载词典，不分词的代码路径（如评分缓存全部命中）没有任何开销；
+#   2. 预构建缓存：主词典和 JIEBA_USER_DICTS 中的用户词典编译成一个前缀词典，
+#      以 pickle 保存在 JIEBA_CACHE_DIR，文件名取词典内容哈希，词典变化时自动重建并清理旧缓存。
+#      （jieba 自带的缓存放在系统临时目录、不含用户词典，且 marshal 格式加载比 pickle 慢）
+#
+# 用法：
+#     python jieba_cache.py            # 预构建缓存
+#     python jieba_cache.py --bench    # 对比冷启动、热启动和 jieba 默认方式的启动耗时
+
+import os
+import sys
+import glob
+import time
+import pickle
+import hashlib
+import logging
+import tempfile
+import threading
+import importlib.util
+import importlib.metadata
+from config import JIEBA_CACHE_DIR, JIEBA_USER_DICTS
+
+_lock = threading.Lock()
+_tokenizer = None     # 已初始化的 jieba.dt
+_fingerprint = None
+
+
+def dictionary_fingerprint():
+    """jieba 版本、主词典和全部用户词典内容的哈希（不导入 jieba）"""
+    global _fingerprint
+    if _fingerprint is None:
+        spec = importlib.util.find_spec("jieba")
+        main_dict = os.path.join(spec.submodule_search_locations[0], "dict.txt")
+        try:
+            version = importlib.metadata.version("jieba")
+        except importlib.metadata.PackageNotFoundError:
+            version = "unknown"
+        h = hashlib.sha256(version.encode("utf-8"))
+        for path in [main_dict] + list(JIEBA_USER_DICTS):
+            h.update(b"\0")
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                    h.update(chunk)
+        _fingerprint = h.hexdigest()
+    return _fingerprint
+
+
+def cache_path(fingerprint=None):
+    return os.path.join(JIEBA_CACHE_DIR, f"jieba.{(fingerprint or dictionary_fingerprint())[:16]}.pkl")
+
+
+def _build(tokenizer, finalseg):
+    """从词典文本构建前缀词典，再加载用户词典；返回需要写入缓存的状态"""
+    forced_before = set(finalseg.Force_Split_Words)
+    tokenizer.FREQ, tokenizer.total = tokenizer.gen_pfdict(tokenizer.get_dict_file())
+    tokenizer.initialized = True
+    for path in JIEBA_USER_DICTS:
+        tokenizer.load_userdict(path)
+    return {
+        'FREQ': tokenizer.FREQ,
+        'total': tokenizer.total,
+        'user_word_tag_tab': tokenizer.user_word_tag_tab,
+        'force_split': sorted(set(finalseg.Force_Split_Words) - forced_before),  # 用户词典中词频为 0 的词
+    }
+
+
+def _save(state, path):
+    """原子写入缓存，并删除其他（过期词典的）缓存文件"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+    for old in glob.glob(os.path.join(os.path.dirname(path), "jieba.*.pkl")):
+        if os.path.abspath(old) != os.path.abspath(path):
+            try:
+                os.remove(old)
+            except OSError:
+                pass
+
+
+def _load(path):
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "rb") as f:
+            return pickle.load(f)
+    except Exception as e:
+        logging.warning(f"读取 jieba 缓存 {path} 失败，将重新构建: {e}")
+        return None
+
+
+def get_tokenizer():
+    """返回已加载词典的 jieba 默认分词器；首次调用时优先从缓存加载，没有缓存则构建并写入"""
+    global _tokenizer
+    if _tokenizer is not None:
+        return _tokenizer
+    with _lock:
+        if _tokenizer is not None:
+            return _tokenizer
+        import jieba
+        from jieba import finalseg
+        jieba.setLogLevel(logging.WARNING)
+        tokenizer = jieba.dt
+        path = cache_path()
+        state = _load(path)
+        if state is None:
+            state = _build(tokenizer, finalseg)
+            try:
+                _save(state, path)
+            except OSError as e:
+                logging.warning(f"写入 jieba 缓存 {path} 失败: {e}")
+        else:
+            with tokenizer.lock:
+                tokenizer.FREQ = state['FREQ']
+                tokenizer.total = state['total']
+                tokenizer.user_word_tag_tab = state['user_word_tag_tab']
+                for word in state['force_split']:
+                    finalseg.add_force_split(word)
+                tokenizer.initialized = True
+        _tokenizer = tokenizer
+    return _tokenizer
+
+
+def lcut(text):
+    """与 jieba.lcut 相同，词典按需加载"""
+    return get_tokenizer().lcut(text)
+
+
+def _bench(runs=3):
+    """在新进程中分别测量冷启动（无缓存）、热启动（有缓存）和 jieba 默认初始化的耗时"""
+    import subprocess
+
+    def run(code):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], check=True, stderr=subprocess.DEVNULL)
+        return time.perf_counter() - start
+
+    ours = "import jieba_cache; jieba_cache.lcut('预热')"
+    baseline = "import jieba; jieba.lcut('预热')"
+    results = {'冷启动（构建缓存）': [], '热启动（读取缓存）': [], 'jieba 默认': [], '仅导入（不分词）': []}
+    for _ in range(runs):
+        path = cache_path()
+        if os.path.exists(path):
+            os.remove(path)
+        results['冷启动（构建缓存）'].append(run(ours))
+        results['热启动（读取缓存）'].append(run(ours))
+        results['jieba 默认'].append(run(baseline))
+        results['仅导入（不分词）'].append(run("import jieba_cache; jieba_cache.dictionary_fingerprint()"))
+    for label, times in results.items():
+        print(f"{label}: {min(times):.3f} 秒（{runs} 次取最小，含 Python 进程启动）")
+
+
+if __name__ == "__main__":
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    if "--bench" in sys.argv[1:]:
+        _bench()
+    else:
+        start = time.perf_counter()
+        get_tokenizer()
+        print(f"jieba 缓存已就绪：{cache_path()}（{time.perf_counter() - start:.3f} 秒）")
@@ -1,132 +1,189 @@
-import subprocess
 import sys
+import argparse
+import multiprocessing
 import os
-
-# 步骤列表（按执行顺序）
-STEPS = [
-    ("step1_crawler.py", "爬取视频列表"),
-    ("step2_subtitle_extractor.py", "提取字幕（音频转文字）"),
-    ("step3_scorer.py", "评分与评级，生成 Excel"),
-    ("step4_deepseek_review.py", "AI 审核（仅 S/A 档），生成 Word 文档")
-]
-
-def run_step_normal(script, description):
-    """普通步骤，使用 run 方式（不实时统计）"""
-    print(f"\n{'='*60}")
-    print(f"开始执行：{description}")
-    print(f"脚本文件：{script}")
-    print('='*60)
-
-    result = subprocess.run(
-        [sys.executable, script],
-        capture_output=True,
-        text=True,
-        encoding='utf-8',
-        errors='replace'
-    )
-
-    if result.stdout:
-        print("\n--- 脚本输出 ---")
-        print(result.stdout)
-
-    if result.returncode != 0:
-        print(f"\n❌ 步骤执行失败：{description}")
-        if result.stderr:
-            print("--- 错误信息 ---")
-            print(result.stderr)
-        sys.exit(1)
-    else:
-        print(f"\n✅ 步骤完成：{description}")
-
-def run_step_with_stats(script, description):
-    """运行 step2，实时统计下载和识别数量"""
-    print(f"\n{'='*60}")
-    print(f"开始执行：{description}")
-    print(f"脚本文件：{script}")
-    print('='*60)
-
-    # 初始化统计变量
-    downloaded = 0
-    transcribed = 0
-
-    # 启动子进程，实时捕获输出
-    process = subprocess.Popen(
-        [sys.executable, script],
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        text=True,
-        encoding='utf-8',
-        errors='replace',
-        bufsize=1  # 行缓冲
-    )
-
-    # 实时读取输出并统计
-    for line in iter(process.stdout.readline, ''):
-        if not line:
-            break
-        line = line.strip()
-        if not line:
-            continue
-        print(line)
-        if "音频下载完成" in line:
-            downloaded += 1
-        if "字幕已保存" in line:
-            transcribed += 1
-
-    # 读取剩余输出
-    for line in process.stdout:
-        line = line.strip()
-        if line:
-            print(line)
-
-    process.wait()
-
-    # 读取错误输出
-    stderr = process.stderr.read()
-    if stderr:
-        print("--- 错误信息 ---")
-        print(stderr)
-
-    # 输出最终统计
-    print(f"最终统计：已下载 {downloaded} 个音频，已识别 {transcribed} 个视频")
-
-    print(f"step2 退出码: {process.returncode}")
-    if process.returncode != 0:
-        if transcribed > 0 or downloaded > 0:
-            print(f"\n⚠️  步骤 {description} 底层退出码 {process.returncode}，但已成功处理 {transcribed} 个视频，将继续执行。")
+import json
+import time
+import select
+import socket
+import threading
+import progress
+from progress import PROGRESS_ENV
+
+# 各阶段事件所属的步骤，用于按步骤统计进度
+STEP_OF_STAGE = {
+    "step1": "爬取", "crawl": "爬取",
+    "step2": "字幕", "manifest": "字幕", "download": "字幕", "transcribe": "字幕",
+    "step3": "评分", "score": "评分",
+    "step4": "审核", "review": "审核",
+}
+
+# 这些结果表示一个视频（或一页）在该步骤中已经处理完毕；下载成功后还要识别，不算完成
+FINAL_OUTCOMES = {"ok", "failed", "native", "skipped", "empty"}
+
+def is_item_finished(event):
+    if event.get('outcome') not in FINAL_OUTCOMES:
+        return False
+    return not (event.get('stage') == "download" and event.get('outcome') == "ok")
+
+def format_seconds(seconds):
+    seconds = int(seconds)
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+class ProgressMonitor:
+    """
+    在本机端口上接收 Pipeline 各阶段发来的 JSON 进度事件（见 progress.py），
+    包括本进程中的爬取、评分、审核线程和字幕 worker 子进程，实时统计完成数、吞吐量和预计剩余时间。
+    """
+
+    def __init__(self):
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.bind(("127.0.0.1", 0))
+        self.server.listen()
+        self.addr = "%s:%d" % self.server.getsockname()
+        self.lock = threading.Lock()
+        self.idle = threading.Condition(self.lock)
+        self.connections = 0  # 尚未关闭的上报连接数
+        self.reset()
+        threading.Thread(target=self._accept_loop, daemon=True).start()
+
+    def reset(self):
+        """清空统计；各阶段在同一次流水线运行中并行上报，整个运行共用一份统计，只在创建时调用"""
+        with self.lock:
+            self.totals = {}         # 步骤 -> 预计总数（来自 start 事件）
+            self.finished = 0
+            self.step_finished = {}  # 步骤 -> 已完成数
+            self.counts = {}         # (stage, outcome) -> 次数
+            self.bytes = 0
+            self.audio_seconds = 0.0
+            self.started = time.time()
+
+    def _accept_loop(self):
+        while True:
+            try:
+                conn, _ = self.server.accept()
+            except OSError:
+                return
+            with self.lock:
+                self.connections += 1
+            threading.Thread(target=self._read_events, args=(conn,), daemon=True).start()
+
+    def _read_events(self, conn):
+        try:
+            with conn, conn.makefile("r", encoding="utf-8", errors="replace") as f:
+                for line in f:
+                    try:
+                        event = json.loads(line)
+                    except ValueError:
+                        continue
+                    self.handle(event)
+        finally:
+            with self.lock:
+                self.connections -= 1
+                self.idle.notify_all()
+
+    def wait_idle(self, timeout=5):
+        """
+        流水线结束、本进程的上报连接关闭（progress.close）后，等待所有已发出的事件读完：
+        包括字幕 worker 子进程的连接，以及尚未 accept 的连接
+        """
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            with self.lock:
+                self.idle.wait_for(lambda: self.connections == 0, max(deadline - time.time(), 0))
+            pending, _, _ = select.select([self.server], [], [], 0)
+            if not pending:
+                return
+            time.sleep(0.05)
+
+    def handle(self, event):
+        with self.lock:
+            key = (event.get('stage'), event.get('outcome'))
+            self.counts[key] = self.counts.get(key, 0) + 1
+            step = STEP_OF_STAGE.get(event.get('stage'), event.get('stage'))
+            if event.get('outcome') == "start" and event.get('total') is not None:
+                self.totals[step] = event['total']
+                return
+            self.bytes += event.get('bytes') or 0
+            if event.get('stage') == "transcribe":
+                self.audio_seconds += event.get('audio_duration') or 0.0
+            if not is_item_finished(event):
+                return
+            self.finished += 1
+            self.step_finished[step] = self.step_finished.get(step, 0) + 1
+            print(self.status_line())
+            sys.stdout.flush()
+
+    def count(self, stage, outcome):
+        return self.counts.get((stage, outcome), 0)
+
+    def status_line(self):
+        elapsed = max(time.time() - self.started, 1e-6)
+        rate = self.finished / elapsed
+        total = sum(self.totals.values()) if len(self.step_finished) <= 1 else None
+        if total is not None:
+            parts = [f"[进度] 已完成 {self.finished}" + (f"/{total}" if total else "")]
         else:
-            print(f"\n❌ 步骤执行失败：{description}")
-            sys.exit(1)
-    else:
-        print(f"\n✅ 步骤完成：{description}")
+            # 流水线模式下多个步骤同时进行，分别显示各步骤的完成数
+            parts = ["[进度] " + " ".join(
+                f"{step} {n}" + (f"/{self.totals[step]}" if step in self.totals else "")
+                for step, n in self.step_finished.items()
+            )]
+        parts.append(f"吞吐 {rate * 60:.1f} 个/分钟")
+        if self.audio_seconds:
+            parts.append(f"音频 {self.audio_seconds / elapsed:.2f} 音频秒/秒")
+        if self.bytes:
+            parts.append(f"数据 {self.bytes / 1024 / 1024:.1f} MB")
+        if total and rate > 0:
+            parts.append(f"预计剩余 {format_seconds(max(total - self.finished, 0) / rate)}")
+        return " | ".join(parts)
 
 def check_config():
     if not os.path.exists("config.py"):
         print("⚠️  警告：未找到 config.py 文件，请确保已创建并配置。")
         print("   如果缺少该文件，后续步骤可能失败。")
 
-def main():
+def parse_args():
+    parser = argparse.ArgumentParser(description="B 站视频质量自动化审核全流程")
+    parser.add_argument("--incremental", action="store_true",
+                        help="只处理已发现视频库中没有的新视频（同 step1 --incremental）")
+    parser.add_argument("--no-review-cache", action="store_true",
+                        help="审核时不使用也不更新 DeepSeek 回复缓存（同 step4 --no-cache）")
+    return parser.parse_args()
+
+def main(incremental=False, review_cache=True):
     print("开始执行 B 站视频质量自动化审核全流程")
+    print("爬取 → 字幕 → 评分 → 审核 四个阶段流水线并行，每个视频完成上一阶段后立即进入下一阶段")
     print("="*60)
 
     check_config()
     os.makedirs("./data", exist_ok=True)
 
-    for script, desc in STEPS:
-        if not os.path.exists(script):
-            print(f"⚠️  跳过：{script} 不存在")
-            continue
-        if script == "step2_subtitle_extractor.py":
-            run_step_with_stats(script, desc)
-        else:
-            run_step_normal(script, desc)
+    monitor = ProgressMonitor()
+    os.environ[PROGRESS_ENV] = monitor.addr  # 本进程和字幕 worker 子进程都向监视器上报进度
+    from pipeline import Pipeline
+    result = Pipeline(incremental=incremental, review_cache=review_cache).run()
+    progress.close()
+    monitor.wait_idle()
+
+    with monitor.lock:
+        print(f"最终统计：{monitor.status_line()}")
+        print(f"字幕：已下载 {monitor.count('download', 'ok')} 个音频，"
+              f"已识别 {monitor.count('transcribe', 'ok')} 个视频，"
+              f"使用自带字幕 {monitor.count('download', 'native')} 个，"
+              f"跳过 {monitor.count('manifest', 'skipped')} 个")
 
     print("\n" + "="*60)
-    print("🎉 全流程执行完毕！最终结果：")
+    print(f"🎉 全流程执行完毕！共评分 {result['scored']} 个视频，审核 {result['reviewed']} 个。最终结果：")
+    print("   - 结果库：./data/results.db（Excel 和完整指标表均由它导出）")
     print("   - Excel 报告：./data/video_scores.xlsx")
+    print("   - 完整指标表：./data/video_metrics.csv（安装 pyarrow 时另有 .parquet）")
     print("   - Word 评价文件：./data/word_reviews/")
     print("   - 字幕文件：./data/subtitles/")
     print("="*60)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    # 字幕 worker 必须使用 spawn 方式启动，与 step2 一致
+    multiprocessing.set_start_method('spawn', force=True)
+    args = parse_args()
+    main(incremental=args.incremental, review_cache=not args.no_review_cache)
@@ -0,0 +1,183 @@
+# multi_pattern.py
+# 多模式计数：用 Aho-Corasick 自动机一次扫描文本，同时统计多个词在文本中出现的次数。
+# 计数语义与逐个调用 str.count 完全一致：每个词独立计数，同一个词的多次出现互不重叠
+# （如 "哈哈" 在 "哈哈哈" 中计 1 次），不同词之间可以重叠（"但是" 和 "是" 各自计数）；
+# 空字符串按 str.count 的规则计为 len(text) + 1 次。
+#
+# 纯 Python 的逐字扫描有固定开销，词表较小时逐词 str.count（C 实现）反而更快：
+# 实测 3 万字文本上，约 150 个词以内 str.count 占优，之后自动机的耗时基本不随词数增长。
+# 因此词数少于 AUTOMATON_MIN_PATTERNS 时 count() 仍逐词调用 str.count，两种方式结果完全相同。
+#
+# PatternStream 支持分块扫描（跨块的出现同样计数），用于长文本的流式指标计算。
+#
+# 直接运行本文件会做随机等价性自检（两种方式和分块扫描都会检查），并比较耗时：
+#     python multi_pattern.py
+
+from collections import deque
+
+AUTOMATON_MIN_PATTERNS = 160  # 非空模式串达到该数量时使用自动机扫描
+
+
+class MultiPatternCounter:
+    """
+    由一组模式串构建的 Aho-Corasick 自动机（预先展开为完整的状态转移表）。
+    count(text) 返回 {模式串: 出现次数}，结果与 {p: text.count(p) for p in patterns} 相同。
+    min_automaton_patterns 为 0 时总是使用自动机。
+    """
+
+    def __init__(self, patterns, min_automaton_patterns=AUTOMATON_MIN_PATTERNS):
+        self.patterns = list(dict.fromkeys(patterns))  # 去重并保持顺序
+        self.has_empty = "" in self.patterns
+        keyed = [p for p in self.patterns if p]
+        self.keyed = keyed
+        self.lengths = [len(p) for p in keyed]
+        self.use_automaton = len(keyed) >= min_automaton_patterns
+
+        # 1. 构建字典树：goto[state] 为 {字符: 子状态}，out[state] 为在该状态结束的模式编号
+        goto = [{}]
+        out = [[]]
+        for pid, pattern in enumerate(keyed):
+            state = 0
+            for ch in pattern:
+                nxt = goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[state][ch] = nxt
+                    goto.append({})
+                    out.append([])
+                state = nxt
+            out[state].append(pid)
+
+        # 2. 按层次遍历计算失配指针，并把失配状态的转移和输出合并进来，
+        #    得到完整的转移表：扫描时每个字符只需查一次字典
+        fail = [0] * len(goto)
+        delta = [dict(g) for g in goto]
+        order = deque(goto[0].values())
+        while order:
+            state = order.popleft()
+            f = fail[state]
+            # 失配状态的转移在 BFS 中已完整，子状态没有的字符沿用失配状态的转移
+            for ch, target in delta[f].items():
+                delta[state].setdefault(ch, target)
+            for ch, child in goto[state].items():
+                order.append(child)
+                fail[child] = delta[f].get(ch, 0)
+            out[state] = out[state] + out[f]
+        self.delta = delta
+        self.out = [tuple(o) for o in out]
+
+    def count(self, text):
+        """统计全部模式串的出现次数（每个模式串内部不重叠）"""
+        if self.use_automaton:
+            result = self.scan(text)
+        else:
+            result = {p: text.count(p) for p in self.keyed}
+        if self.has_empty:
+            result[""] = len(text) + 1
+        return result
+
+    def scan(self, text):
+        """用自动机一次扫描文本，返回非空模式串的出现次数"""
+        stream = self.stream()
+        stream.feed(text)
+        return stream.keyed_counts()
+
+    def stream(self):
+        """返回可分块喂入文本的扫描状态（见 PatternStream）"""
+        return PatternStream(self)
+
+
+class PatternStream:
+    """
+    分块扫描：携带自动机状态和各模式串的计数位置，跨块边界的出现也能识别。
+    依次 feed 各块后，counts() 与对拼接后的全文调用 MultiPatternCounter.count 完全相同。
+    """
+
+    def __init__(self, counter):
+        self.counter = counter
+        self.counts_by_id = [0] * len(counter.keyed)
+        self.next_start = [0] * len(counter.keyed)  # 每个模式串下一次可以被计数的最早起点
+        self.state = 0
+        self.length = 0  # 已扫描的字符数
+
+    def feed(self, text):
+        counts = self.counts_by_id
+        next_start = self.next_start
+        lengths = self.counter.lengths
+        delta = self.counter.delta
+        out = self.counter.out
+        state = self.state
+        end = self.length + 1
+        for ch in text:
+            state = delta[state].get(ch, 0)
+            if out[state]:
+                # 同一模式串的出现按结束位置递增报告，起点不早于上次计数的终点才计数，
+                # 与 str.count 从左到右、跳过已匹配部分的规则等价
+                for pid in out[state]:
+                    start = end - lengths[pid]
+                    if start >= next_start[pid]:
+                        counts[pid] += 1
+                        next_start[pid] = end
+            end += 1
+        self.state = state
+        self.length = end - 1
+
+    def keyed_counts(self):
+        return dict(zip(self.counter.keyed, self.counts_by_id))
+
+    def counts(self):
+        result = self.keyed_counts()
+        if self.counter.has_empty:
+            result[""] = self.length + 1
+        return result
+
+
+def _self_check(rounds=3000, seed=0):
+    """随机生成模式串和文本，验证与 str.count 的结果完全一致"""
+    import random
+    import time
+
+    rng = random.Random(seed)
+    alphabets = ["ab", "abc", "的是了我但所以？", "aaab"]
+    for _ in range(rounds):
+        alphabet = rng.choice(alphabets)
+        patterns = [
+            "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 4)))
+            for _ in range(rng.randint(1, 8))
+        ]
+        text = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 60)))
+        expected = {p: text.count(p) for p in patterns}
+        actual = MultiPatternCounter(patterns, min_automaton_patterns=0).count(text)
+        assert actual == expected, (patterns, text, actual, expected)
+        assert MultiPatternCounter(patterns).count(text) == expected
+        # 随机切块分段扫描，结果应与整段相同
+        stream = MultiPatternCounter(patterns).stream()
+        cuts = sorted(rng.randint(0, len(text)) for _ in range(rng.randint(0, 4)))
+        for left, right in zip([0] + cuts, cuts + [len(text)]):
+            stream.feed(text[left:right])
+        assert stream.counts() == expected, (patterns, text, cuts)
+    print(f"随机等价性自检通过（{rounds} 组）")
+
+    # 比较两种方式在不同词表规模下的耗时（第一行为 step3 当前实际使用的词表）
+    from config import VIRTUAL_WORDS, LOGIC_WORDS
+    hanzi = [chr(0x4e00 + i) for i in range(800)]
+    sample = "".join(rng.choice(hanzi) for _ in range(30000))
+    lexicons = [list(VIRTUAL_WORDS) + list(LOGIC_WORDS) + ['？', '我']]
+    for n in (50, 150, 500):
+        lexicons.append(list({"".join(rng.choice(hanzi[:300]) for _ in range(rng.randint(1, 3)))
+                              for _ in range(n)}))
+    for words in lexicons:
+        counter = MultiPatternCounter(words, min_automaton_patterns=0)
+        assert counter.count(sample) == {w: sample.count(w) for w in words}
+        timings = []
+        for fn in (lambda: {w: sample.count(w) for w in words}, lambda: counter.count(sample)):
+            start = time.perf_counter()
+            for _ in range(5):
+                fn()
+            timings.append((time.perf_counter() - start) / 5 * 1000)
+        print(f"{len(words):4d} 个词 / {len(sample)} 字：逐词 str.count {timings[0]:.2f} ms，"
+              f"自动机 {timings[1]:.2f} ms")
+
+
+if __name__ == "__main__":
+    _self_check()
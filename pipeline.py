@@ -0,0 +1,219 @@
+# pipeline.py
+# 进程内流水线：爬取 → 字幕 → 评分 → 审核 四个阶段同时运行，
+# 每个视频完成上一阶段后立即进入下一阶段，不必等上一步骤全部结束，
+# 第一个审核结果在几分钟内即可产出。各步骤脚本仍可单独运行，本模块复用它们的单视频函数。
+
+import os
+import time
+import queue
+import logging
+import itertools
+import threading
+import traceback
+import step1_crawler
+import step2_subtitle_extractor as step2
+import step3_scorer
+import step4_deepseek_review
+from result_store import ResultStore, REVIEW_PENDING
+from config import SUBTITLE_DIR, AUDIO_DIR
+
+# ==================== 配置 ====================
+SCORE_CONCURRENCY = 2    # 同时评分的线程数
+REVIEW_CONCURRENCY = step4_deepseek_review.REVIEW_CONCURRENCY  # 同时进行的 AI 审核数
+# 审核的请求速率由 step4 的 REQUESTS_PER_MINUTE 令牌桶统一限制，各审核线程共用连接池
+# 字幕阶段的并发由 step2 的 NUM_WORKERS / DOWNLOAD_CONCURRENCY 控制，爬取阶段由 step1 的 CONCURRENCY 控制
+# =============================================
+
+_DONE = object()  # 队列结束标记
+
+class Stage:
+    """
+    流水线中的一个阶段：concurrency 个线程从输入队列取视频并调用 handler，
+    handler 自行把结果交给下一阶段。close() 后处理完已排队的视频即结束。
+    """
+
+    def __init__(self, name, handler, concurrency):
+        self.name = name
+        self.handler = handler
+        self.inbox = queue.Queue()
+        self.threads = [
+            threading.Thread(target=self._run, name=f"{name}-{i}", daemon=True)
+            for i in range(max(1, concurrency))
+        ]
+
+    def start(self):
+        for t in self.threads:
+            t.start()
+
+    def put(self, item):
+        self.inbox.put(item)
+
+    def close(self):
+        for _ in self.threads:
+            self.inbox.put(_DONE)
+
+    def join(self):
+        for t in self.threads:
+            t.join()
+
+    def _run(self):
+        while True:
+            item = self.inbox.get()
+            if item is _DONE:
+                return
+            try:
+                self.handler(item)
+            except Exception as e:
+                logging.exception(f"{self.name}阶段处理 {item} 时出错")
+                print(f"  {self.name}阶段处理 {item} 时出错: {e}")
+
+class Pipeline:
+    """
+    爬取在后台线程中运行，发现的视频经队列交给字幕阶段（step2 的 WorkerSupervisor），
+    字幕完成（或清单显示已是最新）的视频立即评分，S/A 档立即审核。
+    评分和审核结果逐条写入与 step3/step4 共用的结果库，已审核且字幕和评级未变的视频不再重复审核；
+    全部结束后由结果库导出 Excel（含 Word 文件列）和完整指标表。
+    """
+
+    def __init__(self, incremental=False, review_cache=True):
+        self.incremental = incremental
+        self.review_cache = review_cache  # 是否使用 step4 的 DeepSeek 回复缓存
+        self.titles = {}           # bvid -> 标题（来自爬取结果）
+        self.queued = set()        # 已进入评分阶段的 bvid，避免重复评分
+        self.scored = 0            # 本次评分的视频数
+        self.reviewed = 0          # 本次审核的视频数
+        self.lock = threading.Lock()
+        self.scorer = step3_scorer.VideoScorer()
+        self.score_cache = step3_scorer.MetricsCache()
+        self.store = ResultStore()
+        self.score_stage = Stage("评分", self.score, SCORE_CONCURRENCY)
+        self.review_stage = Stage("审核", self.review, REVIEW_CONCURRENCY)
+        self.started = None
+        self.first_review_seconds = None
+
+    # ---------- 阶段 1：爬取 ----------
+    def crawl(self, videos):
+        def on_video(video):
+            with self.lock:
+                self.titles[video['bvid']] = video.get('title', '')
+            videos.put(video)
+
+        try:
+            step1_crawler.main(incremental=self.incremental, on_video=on_video)
+        except Exception as e:
+            logging.exception("爬取阶段出错")
+            print(f"爬取阶段出错，已发现的视频将继续处理: {e}")
+        finally:
+            videos.put(_DONE)
+
+    # ---------- 阶段 2：字幕 ----------
+    def extract_subtitles(self, videos):
+        # worker 边识别边计算评分指标，设备方案为此预留 CPU 核心
+        plan = step2.resolve_device_plan(step2.NUM_WORKERS, stream_metrics=True)
+        manifest = step2.Manifest()
+        print(f"识别设备: {plan['device']}（{plan['compute_type']}），{plan['num_workers']} 个模型实例")
+
+        def on_done(bvid, audio_file, source, metrics):
+            manifest.record(bvid, audio_file, plan['compute_type'], source)
+            if metrics:
+                # worker 已边识别边算好基础指标，评分阶段直接命中缓存，不再分词
+                self.score_cache.put(bvid, metrics['text_sha256'], metrics['metrics'])
+            self.enqueue_score(bvid)
+
+        stats = {'skipped': 0}
+        tasks = step2.iter_tasks(
+            itertools.islice(videos, step2.MAX_VIDEOS), manifest, plan['compute_type'], stats,
+            on_skip=lambda bvid, title: self.enqueue_score(bvid)
+        )
+        supervisor = step2.WorkerSupervisor(
+            plan, step2.MAX_RETRIES, step2.DOWNLOAD_CONCURRENCY, step2.PREFETCH_DEPTH,
+            on_done=on_done, stream_metrics=plan['stream_metrics']
+        )
+        results = supervisor.run(tasks)
+        successful = sum(1 for r in results.values() if r)
+        print(f"字幕阶段结束：成功 {successful} 个，无需重新处理 {stats['skipped']} 个")
+
+    # ---------- 阶段 3：评分 ----------
+    def enqueue_score(self, bvid):
+        with self.lock:
+            if bvid in self.queued:
+                return
+            self.queued.add(bvid)
+        self.score_stage.put(bvid)
+
+    def score(self, bvid):
+        row, metrics, text_hash = step3_scorer.score_file(self.scorer, bvid, cache=self.score_cache)
+        if row is None:
+            return
+        with self.lock:
+            title = self.titles.get(bvid)
+            self.scored += 1
+        status = self.store.save_score(bvid, row, metrics, text_hash, title)
+        print(f"已评分：{bvid} -> {row[-1]}")
+        if status == REVIEW_PENDING:
+            self.review_stage.put(bvid)
+
+    # ---------- 阶段 4：审核 ----------
+    def review(self, bvid):
+        txt_path = os.path.join(SUBTITLE_DIR, f"{bvid}.txt")
+        with open(txt_path, "r", encoding="utf-8") as f:
+            subtitle = f.read()
+        entry = self.store.get(bvid)
+        title = entry['title'] or "未知标题"
+        print(f"正在处理 S/A 档视频：{title}")
+        result = step4_deepseek_review.review_one(bvid, title, entry['rating'], subtitle)
+        if not result:
+            return
+        self.store.mark_reviewed(bvid, *result)
+        with self.lock:
+            self.reviewed += 1
+            first = self.first_review_seconds is None
+            if first:
+                self.first_review_seconds = time.time() - self.started
+        if first:
+            print(f"首个审核结果已产出，距流水线启动 {self.first_review_seconds:.0f} 秒")
+
+    def run(self):
+        """运行整条流水线，返回 {'scored': 评分数, 'reviewed': 审核数}"""
+        self.started = time.time()
+        step3_scorer.force_close_office_apps()
+        os.makedirs(SUBTITLE_DIR, exist_ok=True)
+        os.makedirs(AUDIO_DIR, exist_ok=True)
+        step4_deepseek_review.open_response_cache(self.review_cache)
+        step4_deepseek_review.set_concurrency(REVIEW_CONCURRENCY)
+
+        videos = queue.Queue()
+        crawler = threading.Thread(target=self.crawl, args=(videos,), name="爬取", daemon=True)
+        crawler.start()
+        self.score_stage.start()
+        self.review_stage.start()
+        try:
+            self.extract_subtitles(iter(videos.get, _DONE))
+        except Exception:
+            logging.exception("字幕阶段出错")
+            print("字幕阶段出错，已完成字幕的视频将继续评分和审核")
+            traceback.print_exc()
+        crawler.join()
+
+        # 与 step3 一致：字幕目录中其他已有的字幕（之前运行留下的）也参与评分
+        for filename in sorted(os.listdir(SUBTITLE_DIR)):
+            if filename.endswith('.txt'):
+                self.enqueue_score(filename[:-len('.txt')])
+        self.score_stage.close()
+        self.score_stage.join()
+        self.review_stage.close()
+        self.review_stage.join()
+
+        self.score_cache.save()
+        print(self.score_cache.summary())
+        step4_deepseek_review.close_response_cache()
+        # 与 step3 一致：结果库只保留字幕仍然存在的视频，再导出 Excel 和完整指标表
+        self.store.prune(f[:-len('.txt')] for f in os.listdir(SUBTITLE_DIR) if f.endswith('.txt'))
+        exported, paths = step3_scorer.export_reports(self.store)
+        self.store.close()
+        for path in paths:
+            print(f"完整指标表已保存到 {path}")
+        print(f"评分 {self.scored} 个视频，审核 {self.reviewed} 个视频，"
+              f"共 {exported} 行结果已导出到 {step3_scorer.EXCEL_OUTPUT}")
+        print(f"流水线总耗时 {time.time() - self.started:.0f} 秒")
+        return {'scored': self.scored, 'reviewed': self.reviewed}
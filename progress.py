@@ -0,0 +1,76 @@
+# progress.py
+# 结构化进度事件：各步骤把进度以 JSON 行的形式发送给 main.py，
+# main.py 据此实时显示吞吐量和预计剩余时间，不再依赖解析子进程的日志文字。
+#
+# 事件字段：
+#   stage           阶段，如 "crawl"、"download"、"transcribe"、"score"、"review"
+#   bvid            视频 BV 号（阶段级事件可为空）
+#   outcome         结果："start"（阶段开始，附带 total）、"ok"、"failed"、"native"、"skipped" 等
+#   bytes           本次处理的数据量（字节）
+#   audio_duration  音频时长（秒）
+#   elapsed         本次处理耗时（秒）
+#   total           阶段内预计的视频总数（仅 outcome="start" 时）
+#   pid / ts        发送进程和发送时间（自动填写）
+
+import os
+import json
+import time
+import socket
+import threading
+
+PROGRESS_ENV = "BILI_PROGRESS_ADDR"  # main.py 通过该环境变量告诉子进程上报地址（host:port）
+
+_sock = None
+_disabled = False
+_lock = threading.Lock()
+
+
+def _connect():
+    global _sock, _disabled
+    addr = os.environ.get(PROGRESS_ENV)
+    if not addr:
+        _disabled = True
+        return None
+    host, port = addr.rsplit(":", 1)
+    try:
+        _sock = socket.create_connection((host, int(port)), timeout=5)
+    except OSError:
+        _disabled = True  # 没有监听方时静默关闭上报，不影响步骤本身
+    return _sock
+
+
+def emit(stage, bvid=None, outcome=None, nbytes=None, audio_duration=None, elapsed=None, **extra):
+    """发送一条进度事件；未设置上报地址（单独运行脚本）时什么也不做"""
+    global _disabled
+    if _disabled:
+        return
+    event = {'stage': stage, 'bvid': bvid, 'outcome': outcome}
+    if nbytes is not None:
+        event['bytes'] = nbytes
+    if audio_duration is not None:
+        event['audio_duration'] = round(audio_duration, 3)
+    if elapsed is not None:
+        event['elapsed'] = round(elapsed, 3)
+    event.update(extra)
+    event['pid'] = os.getpid()
+    event['ts'] = round(time.time(), 3)
+    data = (json.dumps(event, ensure_ascii=False) + "\n").encode("utf-8")
+    with _lock:
+        if _sock is None and _connect() is None:
+            return
+        try:
+            _sock.sendall(data)
+        except OSError:
+            _disabled = True
+
+
+def close():
+    """关闭本进程的上报连接（进程内运行完毕时调用，让监听方知道事件已发完）"""
+    global _sock
+    with _lock:
+        if _sock is not None:
+            try:
+                _sock.close()
+            except OSError:
+                pass
+            _sock = None
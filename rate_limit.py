@@ -0,0 +1,62 @@
+# rate_limit.py
+# 令牌桶限速器：限制一段时间内的平均请求速率，同时允许少量突发
+
+import time
+import asyncio
+import threading
+
+
+class AsyncTokenBucket:
+    """
+    asyncio 版令牌桶：每秒补充 rate 个令牌，最多积攒 capacity 个。
+    每次请求前 await acquire()，令牌不足时等待补充。
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        # 持锁等待，保证按请求到达的先后顺序发放令牌
+        async with self.lock:
+            self._refill()
+            if self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= 1
+
+
+class TokenBucket:
+    """
+    线程版令牌桶（用于同步代码，如 step4 的并发审核线程）：每秒补充 rate 个令牌，最多积攒 capacity 个。
+    每次请求前调用 acquire()，令牌不足时阻塞等待补充。
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        # 持锁等待，保证按请求到达的先后顺序发放令牌
+        with self.lock:
+            self._refill()
+            if self.tokens < 1:
+                time.sleep((1 - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= 1
@@ -0,0 +1,108 @@
+# response_cache.py
+# DeepSeek 回复缓存（SQLite）：键为 模型、提示词、temperature、max_tokens 的 SHA-256，
+# 字幕和提示词模板都没变的视频重新审核时直接返回上次的回复，不再消耗时间和 token。
+# 缓存总大小超过上限时按最近使用时间淘汰（LRU）。
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+
+
+def request_key(model, prompt, temperature, max_tokens):
+    """决定回复内容的全部请求参数的哈希"""
+    payload = {'model': model, 'prompt': prompt, 'temperature': temperature, 'max_tokens': max_tokens}
+    return hashlib.sha256(json.dumps(payload, ensure_ascii=False, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    表 responses：每个请求键一行，记录回复、token 用量、原请求耗时和最近使用时间。
+    max_bytes 为回复内容的总字节数上限；连接可在多个审核线程间共用。
+    """
+
+    def __init__(self, path, max_bytes):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                response TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                prompt_tokens INTEGER NOT NULL,
+                completion_tokens INTEGER NOT NULL,
+                elapsed REAL NOT NULL,
+                created_at TEXT NOT NULL,
+                last_used REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_responses_last_used ON responses (last_used);
+        """)
+        self.total_bytes = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        self.stats = {'hits': 0, 'misses': 0, 'evicted': 0,
+                      'saved_prompt_tokens': 0, 'saved_completion_tokens': 0, 'saved_seconds': 0.0}
+
+    def get(self, key):
+        """命中时返回回复文本并更新最近使用时间，否则返回 None"""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT response, prompt_tokens, completion_tokens, elapsed FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.stats['misses'] += 1
+                return None
+            with self.conn:
+                self.conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), key))
+            response, prompt_tokens, completion_tokens, elapsed = row
+            self.stats['hits'] += 1
+            self.stats['saved_prompt_tokens'] += prompt_tokens
+            self.stats['saved_completion_tokens'] += completion_tokens
+            self.stats['saved_seconds'] += elapsed
+            return response
+
+    def put(self, key, response, usage=None, elapsed=0.0):
+        """写入一条回复（usage 为接口返回的 token 用量），超出大小上限时淘汰最久未使用的条目"""
+        usage = usage or {}
+        size = len(response.encode("utf-8"))
+        with self.lock, self.conn:
+            old = self.conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self.conn.execute("""
+                INSERT OR REPLACE INTO responses
+                    (key, response, size, prompt_tokens, completion_tokens, elapsed, created_at, last_used)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, (key, response, size, usage.get('prompt_tokens', 0), usage.get('completion_tokens', 0),
+                  elapsed, time.strftime("%Y-%m-%d %H:%M:%S"), time.time()))
+            self.total_bytes += size - (old[0] if old else 0)
+            while self.total_bytes > self.max_bytes:
+                victims = self.conn.execute(
+                    "SELECT key, size FROM responses WHERE key != ? ORDER BY last_used LIMIT 100", (key,)
+                ).fetchall()
+                if not victims:
+                    break
+                for victim, victim_size in victims:
+                    self.conn.execute("DELETE FROM responses WHERE key = ?", (victim,))
+                    self.total_bytes -= victim_size
+                    self.stats['evicted'] += 1
+                    if self.total_bytes <= self.max_bytes:
+                        break
+
+    def summary(self):
+        s = self.stats
+        lookups = s['hits'] + s['misses']
+        saved_tokens = s['saved_prompt_tokens'] + s['saved_completion_tokens']
+        text = (f"回复缓存：命中 {s['hits']}/{lookups}，未命中 {s['misses']}，"
+                f"节省 {saved_tokens} 个 token（输入 {s['saved_prompt_tokens']}，输出 {s['saved_completion_tokens']}），"
+                f"约 {s['saved_seconds']:.0f} 秒；缓存 {self.total_bytes / 1024 / 1024:.1f} MB")
+        if s['evicted']:
+            text += f"，淘汰 {s['evicted']} 条"
+        return text
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
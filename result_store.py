@@ -0,0 +1,155 @@
+# result_store.py
+# 评分与审核结果库（SQLite）：step3、step4 和流水线共用的唯一数据来源。
+#   - step3 每评完一个视频写入一行（基础指标、复合分、评级），S/A 档标记为待审核；
+#   - step4 用索引查询待审核的视频，每审核完一个只更新这一行（最终评级、Word 文件、审核状态）；
+#   - video_scores.xlsx 和完整指标表只是导出结果，由 step3_scorer.export_reports 在最后一次性生成。
+# 重新评分时，字幕内容和评级都没变的视频保留原有审核结果，不会重复调用 API。
+
+import os
+import time
+import sqlite3
+import threading
+from config import RESULT_DB_PATH
+
+METRIC_COLUMNS = (
+    'density_virtual', 'density_logic', 'density_question', 'density_firstperson',
+    'vocab_richness', 'density_propernoun', 'length_penalty', 'total_chars'
+)
+
+# 审核状态
+REVIEW_NONE = "none"        # 非 S/A 档，无需审核
+REVIEW_PENDING = "pending"  # 待审核（API 调用失败的视频也保持此状态，下次重试）
+REVIEW_DONE = "done"        # 已生成 Word 文档
+
+
+def needs_review(rating):
+    return rating.startswith('S') or rating.startswith('A')
+
+
+class ResultStore:
+    """
+    评分结果表 results：每个 bvid 一行，score_seq 记录评分顺序（导出时按此排序）。
+    所有写操作各自是一个事务；连接可在多个线程间共用（流水线的评分和审核线程）。
+    """
+
+    def __init__(self, path=None):
+        path = path or RESULT_DB_PATH
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        # WAL：每次提交不必重写整个库，审核过程中其他进程也可以读取
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        metric_defs = ",\n".join(
+            f"{name} {'INTEGER' if name == 'total_chars' else 'REAL'} NOT NULL" for name in METRIC_COLUMNS
+        )
+        self.conn.executescript(f"""
+            CREATE TABLE IF NOT EXISTS results (
+                bvid TEXT PRIMARY KEY,
+                title TEXT,
+                text_sha256 TEXT,
+                {metric_defs},
+                info_score REAL NOT NULL,
+                rational_score REAL NOT NULL,
+                experience_score REAL NOT NULL,
+                rating TEXT NOT NULL,
+                review_status TEXT NOT NULL,
+                final_rating TEXT,
+                word_path TEXT,
+                score_seq INTEGER NOT NULL,
+                scored_at TEXT NOT NULL,
+                reviewed_at TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_results_review ON results (review_status, score_seq);
+            CREATE INDEX IF NOT EXISTS idx_results_rating ON results (rating);
+            CREATE INDEX IF NOT EXISTS idx_results_seq ON results (score_seq);
+        """)
+        self.next_seq = self.conn.execute("SELECT COALESCE(MAX(score_seq), 0) + 1 FROM results").fetchone()[0]
+
+    def save_score(self, bvid, row, metrics, text_hash=None, title=None):
+        """
+        写入（或更新）一个视频的评分，row 为 step3 的 Excel 行 [BV号, 三个复合分, 评级]。
+        字幕哈希和评级都未变化时保留审核结果，否则按新评级重新确定是否待审核。返回审核状态。
+        """
+        _, info, rational, experience, rating = row
+        status = REVIEW_PENDING if needs_review(rating) else REVIEW_NONE
+        now = time.strftime("%Y-%m-%d %H:%M:%S")
+        unchanged = "results.text_sha256 IS excluded.text_sha256 AND results.text_sha256 IS NOT NULL " \
+                    "AND results.rating = excluded.rating"
+        columns = ('bvid', 'title', 'text_sha256') + METRIC_COLUMNS + (
+            'info_score', 'rational_score', 'experience_score', 'rating', 'review_status', 'score_seq', 'scored_at')
+        with self.lock, self.conn:
+            values = (bvid, title, text_hash) + tuple(metrics[name] for name in METRIC_COLUMNS) + (
+                info, rational, experience, rating, status, self.next_seq, now)
+            self.next_seq += 1
+            self.conn.execute(f"""
+                INSERT INTO results ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})
+                ON CONFLICT(bvid) DO UPDATE SET
+                    title = COALESCE(excluded.title, results.title),
+                    {', '.join(f'{name} = excluded.{name}' for name in METRIC_COLUMNS)},
+                    info_score = excluded.info_score,
+                    rational_score = excluded.rational_score,
+                    experience_score = excluded.experience_score,
+                    review_status = CASE WHEN {unchanged} THEN results.review_status ELSE excluded.review_status END,
+                    final_rating = CASE WHEN {unchanged} THEN results.final_rating END,
+                    word_path = CASE WHEN {unchanged} THEN results.word_path END,
+                    reviewed_at = CASE WHEN {unchanged} THEN results.reviewed_at END,
+                    text_sha256 = excluded.text_sha256,
+                    rating = excluded.rating,
+                    score_seq = excluded.score_seq,
+                    scored_at = excluded.scored_at
+            """, values)
+            return self.conn.execute("SELECT review_status FROM results WHERE bvid = ?", (bvid,)).fetchone()[0]
+
+    def get(self, bvid):
+        with self.lock:
+            return self.conn.execute("SELECT * FROM results WHERE bvid = ?", (bvid,)).fetchone()
+
+    def pending_reviews(self):
+        """按评分顺序返回待审核的视频 [(bvid, 标题, 评级)]"""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT bvid, title, rating FROM results WHERE review_status = ? ORDER BY score_seq",
+                (REVIEW_PENDING,)
+            ).fetchall()
+        return [(r['bvid'], r['title'], r['rating']) for r in rows]
+
+    def mark_reviewed(self, bvid, word_path, final_rating):
+        """记录一个视频的审核结果（只更新这一行）"""
+        now = time.strftime("%Y-%m-%d %H:%M:%S")
+        with self.lock, self.conn:
+            self.conn.execute(
+                "UPDATE results SET review_status = ?, word_path = ?, final_rating = ?, reviewed_at = ? WHERE bvid = ?",
+                (REVIEW_DONE, word_path, final_rating, now, bvid)
+            )
+
+    def prune(self, keep_bvids):
+        """删除不在 keep_bvids 中的视频（字幕已被删除），返回删除数"""
+        keep = set(keep_bvids)
+        with self.lock, self.conn:
+            stale = [r[0] for r in self.conn.execute("SELECT bvid FROM results") if r[0] not in keep]
+            self.conn.executemany("DELETE FROM results WHERE bvid = ?", [(b,) for b in stale])
+        return len(stale)
+
+    def iter_results(self, batch_size=1000):
+        """按评分顺序逐行产出全部结果（sqlite3.Row，可按列名取值），分批读取，不一次载入整张表"""
+        with self.lock:
+            cursor = self.conn.execute("SELECT * FROM results ORDER BY score_seq")
+        while True:
+            with self.lock:
+                rows = cursor.fetchmany(batch_size)
+            if not rows:
+                return
+            yield from rows
+
+    def review_counts(self):
+        """各审核状态的视频数"""
+        with self.lock:
+            rows = self.conn.execute("SELECT review_status, COUNT(*) FROM results GROUP BY review_status")
+            return {status: count for status, count in rows}
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
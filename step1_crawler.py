@@ -1,12 +1,24 @@
 import json
 import os
-from bilibili_api import search, sync
+import time
+import sqlite3
+import asyncio
+import argparse
+from bilibili_api import search
 from bilibili_api.search import SearchObjectType
+from rate_limit import AsyncTokenBucket
+from progress import emit
 
 # ==================== 配置 ====================
 SEARCH_KEYWORDS = ["深度", "体系", "权力"]
 NORMAL_PAGES = 2               # 非测试模式下的默认页数
 MAX_PAGES_PER_KEYWORD = NORMAL_PAGES
+CONCURRENCY = 4                # 同时进行的搜索请求数（所有关键词共享）
+REQUESTS_PER_SECOND = 2.0      # 令牌桶限速：平均每秒最多发出的搜索请求数
+BURST = 4                      # 令牌桶容量：允许的瞬时突发请求数
+SEEN_DB_PATH = "./data/seen_videos.db"  # 持久化的已发现视频库（首次/最近发现时间、来源关键词）
+OUTPUT_PATH = "./data/video_urls.json"   # 爬取结束后一次性写出的完整列表
+STREAM_PATH = "./data/video_urls.jsonl"  # 边爬边追加的 JSONL，step2 --follow 可以实时读取
 TEST_MODE = False                # True 表示测试模式，只爬取少量视频
 if TEST_MODE:
     MAX_VIDEOS_TOTAL = 2         # 测试模式总视频数上限
@@ -34,33 +46,241 @@ async def search_videos(keyword, page):
         print(f"  搜索出错: {e}")
         return []
 
-def main():
-    all_videos = []
-    seen_bvids = set()
-    for keyword in SEARCH_KEYWORDS:
-        print(f"\n开始爬取关键词 '{keyword}' 的视频...")
-        for page in range(1, MAX_PAGES_PER_KEYWORD + 1):
-            print(f"  正在爬取第 {page} 页...")
-            videos = sync(search_videos(keyword, page))
-            if not videos:
-                print(f"  第 {page} 页无有效数据，停止当前关键词。")
-                break
+async def fetch_page(keyword, page, semaphore, limiter, stop_pages):
+    """
+    抓取某关键词的一页。若该关键词更早的页已经返回空，则不再发请求；
+    本页为空时记录停止页，后续页随即跳过（每个关键词独立提前停止）。
+    """
+    async with semaphore:
+        if page > stop_pages[keyword]:
+            return None
+        await limiter.acquire()
+        if page > stop_pages[keyword]:
+            return None
+        print(f"  正在爬取关键词 '{keyword}' 第 {page} 页...")
+        start = time.time()
+        videos = await search_videos(keyword, page)
+        if not videos:
+            print(f"  关键词 '{keyword}' 第 {page} 页无有效数据，停止当前关键词。")
+            stop_pages[keyword] = min(stop_pages[keyword], page)
+        emit("crawl", outcome="ok" if videos else "empty", elapsed=time.time() - start,
+             keyword=keyword, page=page, count=len(videos))
+        return videos
+
+async def crawl_all(keywords=None, max_pages=None, on_page=None):
+    """
+    在同一个事件循环中并发抓取所有 关键词 × 页，受并发数和令牌桶双重限制。
+    每页完成时调用 on_page(关键词, 页码, 视频列表)，未请求的页视频列表为 None。
+    """
+    keywords = keywords or SEARCH_KEYWORDS
+    max_pages = max_pages or MAX_PAGES_PER_KEYWORD
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+    limiter = AsyncTokenBucket(REQUESTS_PER_SECOND, BURST)
+    stop_pages = {keyword: max_pages for keyword in keywords}
+
+    async def run_job(keyword, page):
+        videos = await fetch_page(keyword, page, semaphore, limiter, stop_pages)
+        if videos is None:
+            emit("crawl", outcome="skipped", keyword=keyword, page=page)
+        if on_page:
+            on_page(keyword, page, videos)
+
+    emit("step1", outcome="start", total=len(keywords) * max_pages)
+    # 按 页码优先 的顺序创建任务，让各关键词的前几页先拿到令牌
+    await asyncio.gather(*[
+        run_job(keyword, page) for page in range(1, max_pages + 1) for keyword in keywords
+    ])
+
+class VideoMerger:
+    """
+    按 关键词顺序 → 页码顺序 合并去重，结果与串行抓取的顺序一致。
+    页面可以按任意顺序到达：一旦前面的页都已到达，就立即按顺序输出其中的新视频（on_video 回调），
+    每个关键词遇到第一个空页即停止。同时记录每个视频的来源关键词。
+    """
+
+    def __init__(self, keywords=None, max_pages=None, on_video=None):
+        self.keywords = keywords or SEARCH_KEYWORDS
+        self.max_pages = max_pages or MAX_PAGES_PER_KEYWORD
+        self.on_video = on_video
+        self.pending = {}         # 已到达但还不能输出的页
+        self.keyword_index = 0    # 下一个要输出的 (关键词, 页码)
+        self.page = 1
+        self.videos = []
+        self.seen_bvids = set()
+        self.provenance = {}      # bvid -> [命中该视频的关键词, ...]
+
+    @property
+    def full(self):
+        return TEST_MODE and len(self.videos) >= MAX_VIDEOS_TOTAL
+
+    def add_page(self, keyword, page, videos):
+        self.pending[(keyword, page)] = videos
+        while self.keyword_index < len(self.keywords) and not self.full:
+            key = (self.keywords[self.keyword_index], self.page)
+            if key not in self.pending:
+                return  # 前面的页还没到，等待
+            videos = self.pending.pop(key)
+            if videos:
+                self._emit(key[0], videos)
+            if not videos or self.page >= self.max_pages:
+                self.keyword_index += 1  # 空页或已到最后一页，换下一个关键词
+                self.page = 1
+            else:
+                self.page += 1
+
+    def _emit(self, keyword, videos):
+        for v in videos:
+            if self.full:
+                return
+            found = self.provenance.setdefault(v['bvid'], [])
+            if keyword not in found:
+                found.append(keyword)
+            if v['bvid'] not in self.seen_bvids:
+                self.seen_bvids.add(v['bvid'])
+                self.videos.append(v)
+                if self.on_video:
+                    self.on_video(v)
+
+class SeenVideoStore:
+    """
+    持久化的已发现视频库（SQLite）：记录每个 bvid 的首次/最近发现时间和来源关键词，
+    用于增量爬取时只把新视频交给后续步骤。
+    """
+
+    def __init__(self, path=SEEN_DB_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS videos (
+                bvid TEXT PRIMARY KEY,
+                title TEXT,
+                author TEXT,
+                url TEXT,
+                first_seen TEXT NOT NULL,
+                last_seen TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS video_keywords (
+                bvid TEXT NOT NULL,
+                keyword TEXT NOT NULL,
+                first_seen TEXT NOT NULL,
+                last_seen TEXT NOT NULL,
+                PRIMARY KEY (bvid, keyword)
+            );
+        """)
+
+    def known_bvids(self, bvids):
+        """返回给定 bvid 中已在库里的集合"""
+        known = set()
+        bvids = list(bvids)
+        for i in range(0, len(bvids), 500):  # 分批查询，避免超出 SQLite 参数个数上限
+            batch = bvids[i:i + 500]
+            rows = self.conn.execute(
+                f"SELECT bvid FROM videos WHERE bvid IN ({','.join('?' * len(batch))})", batch
+            )
+            known.update(row[0] for row in rows)
+        return known
+
+    def record(self, videos, provenance):
+        """在一个事务中写入本次发现的视频：新视频插入，旧视频更新最近发现时间"""
+        now = time.strftime("%Y-%m-%d %H:%M:%S")
+        with self.conn:
             for v in videos:
-                if v['bvid'] not in seen_bvids:
-                    seen_bvids.add(v['bvid'])
-                    all_videos.append(v)
-                    if TEST_MODE and len(all_videos) >= MAX_VIDEOS_TOTAL:
-                        break
-            if TEST_MODE and len(all_videos) >= MAX_VIDEOS_TOTAL:
-                break
-        if TEST_MODE and len(all_videos) >= MAX_VIDEOS_TOTAL:
-            break
+                self.conn.execute("""
+                    INSERT INTO videos (bvid, title, author, url, first_seen, last_seen)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(bvid) DO UPDATE SET
+                        title = excluded.title, author = excluded.author,
+                        url = excluded.url, last_seen = excluded.last_seen
+                """, (v['bvid'], v['title'], v['author'], v['url'], now, now))
+                for keyword in provenance.get(v['bvid'], []):
+                    self.conn.execute("""
+                        INSERT INTO video_keywords (bvid, keyword, first_seen, last_seen)
+                        VALUES (?, ?, ?, ?)
+                        ON CONFLICT(bvid, keyword) DO UPDATE SET last_seen = excluded.last_seen
+                    """, (v['bvid'], keyword, now, now))
+
+    def close(self):
+        self.conn.close()
+
+class VideoStreamWriter:
+    """
+    追加写 JSONL：每条视频记录写完立即 fsync，下游可以边爬边读。
+    首行为 start 事件，结束时写 end 事件（都带本轮的 run_id），读取方据此只读本轮、判断本轮爬取已结束。
+    新一轮先把 start 事件写进临时文件再替换旧文件，正在跟随读取的 step2 会看到一个新文件（inode 变化），
+    而不是被原地截断的旧文件。
+    """
+
+    def __init__(self, path=STREAM_PATH):
+        self.run_id = f"{time.strftime('%Y%m%d%H%M%S')}-{os.getpid()}"
+        self.count = 0
+        tmp_path = path + ".tmp"
+        self.f = open(tmp_path, "w", encoding="utf-8")
+        self._write({'event': 'start', 'run_id': self.run_id})
+        self.f.close()
+        try:
+            os.replace(tmp_path, path)
+        except PermissionError:
+            # Windows 上旧文件仍被读取方打开时无法替换，退回原地覆盖（读取方发现文件变短会重新打开）
+            with open(tmp_path, "rb") as src, open(path, "wb") as dst:
+                dst.write(src.read())
+            os.remove(tmp_path)
+        self.f = open(path, "a", encoding="utf-8")
+
+    def _write(self, record):
+        self.f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.f.flush()
+        os.fsync(self.f.fileno())
+
+    def write_video(self, video):
+        self._write(video)
+        self.count += 1
 
+    def close(self, complete=True):
+        self._write({'event': 'end', 'run_id': self.run_id, 'count': self.count, 'complete': complete})
+        self.f.close()
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="根据关键词爬取B站视频列表")
+    parser.add_argument("--incremental", action="store_true",
+                        help="只输出已发现视频库中没有的新视频")
+    return parser.parse_args()
+
+def main(incremental=False, on_video=None):
+    """on_video：可选回调，每个交给后续步骤的视频写入流后立即调用（供流水线使用）"""
+    print(f"\n开始爬取 {len(SEARCH_KEYWORDS)} 个关键词，每个最多 {MAX_PAGES_PER_KEYWORD} 页"
+          f"（并发 {CONCURRENCY}，限速 {REQUESTS_PER_SECOND} 次/秒）...")
     os.makedirs("./data", exist_ok=True)
-    output_path = "./data/video_urls.json"
-    with open(output_path, "w", encoding="utf-8") as f:
+    store = SeenVideoStore()
+    stream = VideoStreamWriter()
+    print(f"视频流 {STREAM_PATH} 的 run_id：{stream.run_id}（step2 --follow --run-id 可指定只读本轮）")
+    new_videos = []
+
+    def handle_video(video):
+        # 库在本轮结束时才写入，所以这里查到的都是本轮之前已发现的视频
+        is_new = not store.known_bvids([video['bvid']])
+        if is_new:
+            new_videos.append(video)
+        if is_new or not incremental:  # 增量模式：只把新视频交给后续步骤
+            stream.write_video(video)
+            if on_video:
+                on_video(video)
+
+    merger = VideoMerger(on_video=handle_video)
+    complete = False
+    try:
+        asyncio.run(crawl_all(on_page=merger.add_page))
+        store.record(merger.videos, merger.provenance)
+        complete = True
+    finally:
+        stream.close(complete)
+        store.close()
+    all_videos = new_videos if incremental else merger.videos
+    print(f"\n本次共发现 {len(merger.videos)} 个去重后的视频，其中新视频 {len(new_videos)} 个")
+
+    with open(OUTPUT_PATH, "w", encoding="utf-8") as f:
         json.dump(all_videos, f, ensure_ascii=False, indent=2)
-    print(f"\n爬取完成！共获得 {len(all_videos)} 个去重后的视频，已保存到 {output_path}")
+    print(f"爬取完成！共输出 {len(all_videos)} 个视频，已保存到 {OUTPUT_PATH}（流式副本：{STREAM_PATH}）")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    args = parse_args()
+    main(incremental=args.incremental)
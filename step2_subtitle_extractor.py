@@ -1,13 +1,27 @@
 import os
 import json
+import glob
+import hashlib
 import subprocess
 import time
 import logging
 import sys
+import argparse
+import itertools
 import traceback
+import queue
+import threading
 import multiprocessing
-from faster_whisper import WhisperModel
-from config import SUBTITLE_DIR, AUDIO_DIR, MODEL_PATH, DEVICE, COMPUTE_TYPE
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from faster_whisper import WhisperModel, BatchedInferencePipeline, decode_audio
+from subtitle_fetcher import SubtitleFetcher
+from progress import emit
+from config import (
+    SUBTITLE_DIR, AUDIO_DIR, MODEL_PATH, DEVICE, COMPUTE_TYPE,
+    CPU_THREADS_PER_WORKER, CUDA_BIN_PATH
+)
 
 # 配置日志记录到文件
 logging.basicConfig(
@@ -17,54 +31,238 @@ logging.basicConfig(
     encoding='utf-8'
 )
 
-# 添加 CUDA 路径
-cuda_bin_path = r"C:\Program Files\NVIDIA GPU Computing Toolkit\CUDA\v12.0\bin"
-os.environ['PATH'] = cuda_bin_path + os.pathsep + os.environ.get('PATH', '')
+# 添加 CUDA 路径（仅 Windows 且目录存在时）
+if os.name == 'nt' and os.path.isdir(CUDA_BIN_PATH):
+    os.environ['PATH'] = CUDA_BIN_PATH + os.pathsep + os.environ.get('PATH', '')
 
 # ==================== 配置 ====================
 MAX_VIDEOS = 300  # 最多处理视频数
+INPUT_FILE = "./data/video_urls.json"    # step1 一次性写出的视频列表
+STREAM_FILE = "./data/video_urls.jsonl"  # step1 边爬边追加的视频流（--follow 时读取）
+STREAM_IDLE_TIMEOUT = 600   # --follow 时视频流超过该秒数没有新内容且未结束，则停止等待
+WORKER_MODE = "persistent"  # "persistent"：常驻 worker，模型只加载一次；"isolated"：每个视频一个新进程（旧模式）
+NUM_WORKERS = 0             # 常驻 worker 数量（每个 worker 各自加载一份模型），0 表示自动：GPU 为 1，CPU 按核心数划分
+MAX_RETRIES = 1             # worker 崩溃后，其正在处理的视频最多重新排队的次数
+DOWNLOAD_CONCURRENCY = 3    # 同时进行的 yt-dlp 下载数（persistent 模式下与识别并行）
+PREFETCH_DEPTH = 4          # 最多提前下载（含正在下载）多少个尚未开始识别的音频
+CHECKPOINT_DIR = "./data/checkpoints"  # 识别中途的分段检查点，崩溃重启后从最后一段继续
+MANIFEST_FILE = "./data/step2_manifest.json"  # 已处理清单：输入未变化的视频不再重复识别
+USE_NATIVE_SUBTITLES = True  # 优先使用视频自带的 CC/AI 字幕，没有时才下载音频识别
+# 音频获取方式：
+#   "mp3"：yt-dlp 提取后用 ffmpeg 转码为 mp3（旧方式）
+#   "native"：直接保存原始音频流（m4a/opus），不转码，由 faster-whisper 解码
+#   "pcm"：保存原始音频流，识别时由 ffmpeg 直接解码为 16kHz float32 内存数组
+AUDIO_FORMAT = "native"
+NATIVE_AUDIO_SELECTOR = "worstaudio/bestaudio"  # 原始音频流的 yt-dlp 格式选择，识别用低码率即可，占用磁盘更少
+# 识别方式："sequential"：逐个 30 秒窗口串行识别（旧方式）；
+#          "batched"：先用 VAD 去除静音和背景音乐，再把语音片段批量推理（高吞吐，结果可能略有差异）
+TRANSCRIBE_MODE = "sequential"
+BATCH_SIZE = 8   # batched 模式每批推理的语音片段数（显存/内存不足时调小）
+BEAM_SIZE = 5    # 束搜索宽度
 # =============================================
 
-def process_single_video(bvid, title):
-    """处理单个视频的函数，将在子进程中运行"""
+FFMPEG_LOCATION = os.getenv("FFMPEG_LOCATION", r"C:\Users\c3458\Desktop\世界\学习\重要学习\计算机\b站视频测试\ffmpeg-2026-02-09-git-9bfa1635ae-essentials_build\bin\ffmpeg.exe")
+AUDIO_EXTENSIONS = ('.mp3', '.m4a', '.opus', '.webm', '.aac', '.ogg', '.flac', '.mp4')
+SAMPLE_RATE = 16000  # Whisper 模型的输入采样率
+
+_model = None  # 当前进程已加载的模型（常驻 worker 复用）
+_fetcher_local = threading.local()  # 每个下载线程一个字幕获取器（复用连接）
+
+def detect_device():
+    """DEVICE 为 auto 时检测是否有可用的 CUDA 设备"""
+    if DEVICE != "auto":
+        return DEVICE
+    try:
+        import ctranslate2
+        if ctranslate2.get_cuda_device_count() > 0:
+            return "cuda"
+    except Exception as e:
+        logging.warning(f"检测 CUDA 设备失败，使用 CPU: {e}")
+    return "cpu"
+
+def resolve_device_plan(num_workers=NUM_WORKERS, stream_metrics=False):
+    """
+    决定设备、计算精度、模型实例数和每个实例的 CPU 线程数。
+    CPU 模式下按核心数切分，保证 实例数 × 线程数 不超过核心数，避免线程过度订阅。
+    stream_metrics 为 True 时 worker 还要边识别边分词、计算评分指标（见 transcription_worker），
+    每个实例分到的核心中留出一个给这部分工作。
+    """
+    scoring_cores = 1 if stream_metrics else 0
+    device = detect_device()
+    compute_type = COMPUTE_TYPE
+    if compute_type == "auto":
+        compute_type = "float16" if device == "cuda" else "int8"
+    cores = os.cpu_count() or 1
+    if device == "cpu":
+        if num_workers <= 0:
+            num_workers = max(1, cores // (max(1, CPU_THREADS_PER_WORKER) + scoring_cores))
+        num_workers = min(num_workers, cores)
+        cpu_threads = max(1, cores // num_workers - scoring_cores)
+    else:
+        num_workers = max(1, num_workers)
+        cpu_threads = 0  # 0 表示由 CTranslate2 自行决定
+    return {
+        'device': device,
+        'compute_type': compute_type,
+        'num_workers': num_workers,
+        'cpu_threads': cpu_threads,
+        'stream_metrics': stream_metrics
+    }
+
+def load_model(plan):
+    """按设备方案加载 Whisper 模型（CPU 线程数由 cpu_threads 控制，多个实例合计不超过核心数）"""
+    return WhisperModel(
+        MODEL_PATH,
+        device=plan['device'],
+        compute_type=plan['compute_type'],
+        cpu_threads=plan['cpu_threads'],
+        num_workers=1
+    )
+
+def get_model(plan=None):
+    """返回当前进程的 Whisper 模型，首次调用时加载，之后复用"""
+    global _model
+    if _model is None:
+        _model = load_model(plan or resolve_device_plan())
+    return _model
+
+def process_single_video(bvid, title, model=None):
+    """处理单个视频的函数，将在子进程中运行；成功返回字幕来源（"asr" 或 "native:<语言>"），失败返回 None"""
     try:
         print(f"子进程 {os.getpid()} 开始处理视频 {bvid}...")
         sys.stdout.flush()
 
-        # 下载音频（如果不存在）
-        audio_file = download_audio(bvid, AUDIO_DIR)
-        if not audio_file:
-            return False
+        # 优先使用自带字幕，没有时下载音频（如果不存在）
+        prepared = prepare_video(bvid)
+        if not prepared:
+            return None
+        kind, value = prepared
+        if kind == "native":
+            return f"native:{value}"
 
         # 语音识别
-        transcribe_audio(audio_file, bvid, SUBTITLE_DIR)
-        return True
+        ok, _ = transcribe_single_video(bvid, value, model)
+        return "asr" if ok else None
     except Exception as e:
         print(f"子进程处理视频 {bvid} 时出错: {e}")
         traceback.print_exc()
-        return False
+        return None
 
-def download_audio(bvid, save_dir):
-    url = f"https://www.bilibili.com/video/{bvid}"
-    audio_path = os.path.join(save_dir, f"{bvid}.mp3")
+def transcribe_single_video(bvid, audio_file, model, accumulator=None):
+    """识别一个已下载好的音频，返回 (是否成功, 音频时长秒数)"""
+    start = time.time()
+    try:
+        print(f"子进程 {os.getpid()} 开始识别视频 {bvid}...")
+        sys.stdout.flush()
+        _, duration = transcribe_audio(audio_file, bvid, SUBTITLE_DIR, model=model, accumulator=accumulator)
+        emit("transcribe", bvid, "ok", nbytes=os.path.getsize(audio_file),
+             audio_duration=duration, elapsed=time.time() - start)
+        return True, duration
+    except Exception as e:
+        print(f"子进程识别视频 {bvid} 时出错: {e}")
+        traceback.print_exc()
+        emit("transcribe", bvid, "failed", elapsed=time.time() - start)
+        return False, 0.0
 
-    if os.path.exists(audio_path):
-        print(f"  音频已存在: {audio_path}")
-        return audio_path
+def write_text_atomic(path, text):
+    """先写临时文件再替换，保证目标文件要么是旧内容要么是完整的新内容"""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
 
-    print(f"  正在下载音频: {url}")
-    ffmpeg_location = r"C:\Users\c3458\Desktop\世界\学习\重要学习\计算机\b站视频测试\ffmpeg-2026-02-09-git-9bfa1635ae-essentials_build\bin\ffmpeg.exe"
+def fetch_native_subtitle(bvid, save_dir):
+    """尝试获取视频自带字幕并保存为 {bvid}.txt，成功返回字幕语言，否则返回 None"""
+    fetcher = getattr(_fetcher_local, 'fetcher', None)
+    if fetcher is None:
+        fetcher = _fetcher_local.fetcher = SubtitleFetcher()
+    try:
+        text, lan = fetcher.fetch(bvid)
+    except Exception as e:
+        print(f"  获取视频 {bvid} 自带字幕失败，改用语音识别: {e}")
+        return None
+    if not text:
+        return None
+    txt_path = os.path.join(save_dir, f"{bvid}.txt")
+    write_text_atomic(txt_path, text)
+    print(f"  使用自带字幕（{lan}）")
+    print(f"  字幕已保存: {txt_path}")
+    sys.stdout.flush()
+    return lan
+
+def prepare_video(bvid):
+    """
+    下载阶段：优先获取自带字幕，没有字幕轨道时再下载音频。
+    返回 ("native", 字幕语言) 或 ("audio", 音频路径)，失败返回 None。
+    """
+    start = time.time()
+    if USE_NATIVE_SUBTITLES:
+        lan = fetch_native_subtitle(bvid, SUBTITLE_DIR)
+        if lan:
+            emit("download", bvid, "native", elapsed=time.time() - start,
+                 nbytes=os.path.getsize(os.path.join(SUBTITLE_DIR, f"{bvid}.txt")))
+            return "native", lan
+    audio_file = download_audio(bvid, AUDIO_DIR)
+    if not audio_file:
+        emit("download", bvid, "failed", elapsed=time.time() - start)
+        return None
+    emit("download", bvid, "ok", nbytes=os.path.getsize(audio_file), elapsed=time.time() - start)
+    return "audio", audio_file
+
+def find_audio_file(bvid, save_dir):
+    """查找已下载的音频文件（任意支持的格式），不存在时返回 None"""
+    for path in sorted(glob.glob(os.path.join(glob.escape(save_dir), f"{bvid}.*"))):
+        if os.path.splitext(path)[1].lower() in AUDIO_EXTENSIONS:
+            return path
+    return None
+
+def ffmpeg_binary():
+    """返回可用的 ffmpeg 可执行文件"""
+    return FFMPEG_LOCATION if os.path.exists(FFMPEG_LOCATION) else "ffmpeg"
+
+def decode_pcm(audio_path):
+    """用 ffmpeg 把音频直接解码为 16kHz 单声道 float32 数组，不经过中间文件"""
     cmd = [
-        "yt-dlp",
-        "-x", "--audio-format", "mp3",
-        "--ffmpeg-location", ffmpeg_location,
-        "-o", audio_path,
-        url
+        ffmpeg_binary(), "-nostdin", "-loglevel", "error",
+        "-i", audio_path,
+        "-f", "f32le", "-ac", "1", "-ar", str(SAMPLE_RATE),
+        "pipe:1"
     ]
+    result = subprocess.run(cmd, check=True, capture_output=True)
+    return np.frombuffer(result.stdout, dtype=np.float32)
+
+def download_audio(bvid, save_dir, audio_format=None):
+    audio_format = audio_format or AUDIO_FORMAT
+    url = f"https://www.bilibili.com/video/{bvid}"
+
+    # 已有任意格式的音频都直接复用（切换 AUDIO_FORMAT 后不必重新下载）
+    existing = find_audio_file(bvid, save_dir)
+    if existing:
+        print(f"  音频已存在: {existing}")
+        return existing
+
+    print(f"  正在下载音频: {url}")
+    if audio_format == "mp3":
+        audio_path = os.path.join(save_dir, f"{bvid}.mp3")
+        cmd = ["yt-dlp", "-x", "--audio-format", "mp3"]
+        if os.path.exists(FFMPEG_LOCATION):
+            cmd += ["--ffmpeg-location", FFMPEG_LOCATION]  # 否则使用 PATH 中的 ffmpeg
+        cmd += ["-o", audio_path, url]
+    else:
+        # 保留原始音频流，扩展名由 yt-dlp 按实际格式决定
+        audio_path = None
+        cmd = ["yt-dlp", "-f", NATIVE_AUDIO_SELECTOR,
+               "-o", os.path.join(save_dir, f"{bvid}.%(ext)s"), url]
     try:
         # 添加 timeout=600 秒（10分钟）
         result = subprocess.run(cmd, check=True, capture_output=True, text=True,
                                 encoding='utf-8', timeout=600)
+        audio_path = audio_path or find_audio_file(bvid, save_dir)
+        if not audio_path:
+            print(f"  音频下载失败: 未找到 yt-dlp 输出的音频文件")
+            return None
         print(f"  音频下载完成: {audio_path}")
         return audio_path
     except subprocess.TimeoutExpired:
@@ -73,49 +271,589 @@ def download_audio(bvid, save_dir):
     except subprocess.CalledProcessError as e:
         print(f"  音频下载失败: {e.stderr}")
         return None
-def transcribe_audio(audio_path, bvid, save_dir):
-    print(f"  开始语音识别（GPU）...")
+def load_checkpoint(checkpoint_path, audio_size):
+    """
+    读取分段检查点，返回已提交的分段列表 [{start, end, text}, ...]。
+    首行记录音频大小，音频变化则作废；末尾被截断的半行会被丢弃并从文件中截掉。
+    缺少 end/text 的记录（如旧版本重复写入的首行）不是分段，直接跳过。
+    """
+    if not os.path.exists(checkpoint_path):
+        return []
+    segments = []
+    committed = 0  # 最后一个完整行结束处的字节偏移
+    with open(checkpoint_path, "rb") as f:
+        for raw in f:
+            if not raw.endswith(b"\n"):
+                break
+            try:
+                record = json.loads(raw.decode("utf-8"))
+            except ValueError:
+                break
+            if committed == 0:
+                if record.get('audio_size') != audio_size:
+                    print(f"  检查点与音频不匹配，重新识别")
+                    os.remove(checkpoint_path)
+                    return []
+            elif 'end' in record and 'text' in record:
+                segments.append(record)
+            committed += len(raw)
+    if committed == 0:
+        os.remove(checkpoint_path)
+        return []
+    if committed < os.path.getsize(checkpoint_path):
+        with open(checkpoint_path, "r+b") as f:
+            f.truncate(committed)
+    return segments
+
+def append_checkpoint(f, record):
+    """写入一行检查点记录并落盘"""
+    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    f.flush()
+    os.fsync(f.fileno())
+
+def run_model(model, audio_path, offset=0.0, prompt=None, mode=None):
+    """
+    按识别方式调用模型，返回 (分段字典迭代器, 音频总时长)，分段时间戳都相对于整段音频。
+    sequential：从 offset 续识别时使用 clip_timestamps；
+    batched：VAD 切出语音片段后批量推理，续识别时截掉 offset 之前的音频再把时间戳加回去。
+    """
+    mode = mode or TRANSCRIBE_MODE
+    # pcm 模式下由 ffmpeg 直接解码为内存数组，否则交给 faster-whisper 自行解码
+    audio_input = decode_pcm(audio_path) if AUDIO_FORMAT == "pcm" else audio_path
+    options = {'beam_size': BEAM_SIZE}
+    if prompt:
+        options['initial_prompt'] = prompt
+
+    if mode == "batched":
+        if offset > 0:
+            if isinstance(audio_input, str):
+                audio_input = decode_audio(audio_input, sampling_rate=SAMPLE_RATE)
+            audio_input = audio_input[int(offset * SAMPLE_RATE):]
+        pipeline = BatchedInferencePipeline(model=model)
+        segments, info = pipeline.transcribe(
+            audio_input, batch_size=BATCH_SIZE, vad_filter=True, **options
+        )
+        records = ({'start': seg.start + offset, 'end': seg.end + offset, 'text': seg.text}
+                   for seg in segments)
+        return records, info.duration + offset
+
+    if offset > 0:
+        options['clip_timestamps'] = [offset]
+    segments, info = model.transcribe(audio_input, **options)
+    records = ({'start': seg.start, 'end': seg.end, 'text': seg.text} for seg in segments)
+    return records, info.duration
+
+def transcribe_audio(audio_path, bvid, save_dir, model=None, accumulator=None):
+    """
+    识别音频并保存字幕，返回 (字幕文本, 音频时长秒数)。
+    每识别出一段就连同时间戳写入检查点；中途崩溃后再次调用会从最后一段的结束时间继续，
+    全部完成后再原子地生成 {bvid}.txt 并删除检查点。
+    提供 accumulator（step3 的 MetricsAccumulator）时，每识别出一段就送去计算评分指标，
+    送入的文本与最终写出的字幕完全相同。
+    """
+    if model is None:
+        # 未传入常驻模型时临时加载（isolated 模式下每个子进程独立加载，隔离崩溃）
+        model = load_model(resolve_device_plan(1))
+    os.makedirs(CHECKPOINT_DIR, exist_ok=True)
+    checkpoint_path = os.path.join(CHECKPOINT_DIR, f"{bvid}.segments.jsonl")
+    audio_size = os.path.getsize(audio_path)
+    done_segments = load_checkpoint(checkpoint_path, audio_size)
+
+    offset, prompt = 0.0, None
+    if done_segments:
+        offset = done_segments[-1]['end']
+        prompt = done_segments[-1]['text']  # 续接上文语境
+        print(f"  从检查点继续：已完成 {len(done_segments)} 段，从 {offset:.2f} 秒开始")
+    print(f"  开始语音识别（{model.model.device.upper()}，{TRANSCRIBE_MODE}）...")
     sys.stdout.flush()
-    # 注意：每个子进程都会独立加载模型，这可能会增加内存占用，但可以隔离崩溃
-    model = WhisperModel(MODEL_PATH, device=DEVICE, compute_type=COMPUTE_TYPE)
-    segments, info = model.transcribe(audio_path, beam_size=5)
-    transcript = " ".join([segment.text for segment in segments])
-    print(f"  识别完成，时长: {info.duration:.2f}秒")
+
+    fed = 0
+    def feed(text):
+        # 与下面 " ".join 拼出的字幕一致：段与段之间加一个空格
+        nonlocal fed
+        if accumulator is not None:
+            accumulator.update(" " + text if fed else text)
+        fed += 1
+
+    for record in done_segments:
+        feed(record['text'])
+    segments, duration = run_model(model, audio_path, offset, prompt)
+    with open(checkpoint_path, "a", encoding="utf-8") as f:
+        if f.tell() == 0:
+            # 只在新文件中写首行：识别出第一段之前崩溃时，已有首行的检查点会被原样保留
+            append_checkpoint(f, {'bvid': bvid, 'audio_size': audio_size})
+        for record in segments:
+            append_checkpoint(f, record)
+            done_segments.append(record)
+            feed(record['text'])
+    transcript = " ".join([segment['text'] for segment in done_segments])
+    print(f"  识别完成，时长: {duration:.2f}秒")
     sys.stdout.flush()
+
     txt_path = os.path.join(save_dir, f"{bvid}.txt")
-    with open(txt_path, "w", encoding="utf-8") as f:
-        f.write(transcript)
+    write_text_atomic(txt_path, transcript)
+    os.remove(checkpoint_path)
     print(f"  字幕已保存: {txt_path}")
     sys.stdout.flush()
-    return transcript
+    return transcript, duration
+
+def file_sha256(path):
+    """分块计算文件的 SHA-256"""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+class Manifest:
+    """
+    step2 已处理清单：每个 bvid 记录字幕来源、音频哈希、模型路径、计算精度、识别方式和字幕哈希。
+    只有这些输入都未变化、且字幕文件内容与记录一致时，才跳过该视频。
+    来源为自带字幕（native）的条目只比对字幕哈希。
+    """
+
+    def __init__(self, path=MANIFEST_FILE):
+        self.path = path
+        self.entries = {}
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"读取清单 {path} 失败，将重新建立: {e}")
+
+    def save(self):
+        """原子写入清单文件"""
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def _audio_hash(self, audio_file, entry):
+        """音频大小和修改时间都没变时直接复用记录的哈希，避免每次重读大文件"""
+        stat = os.stat(audio_file)
+        if (entry.get('audio_size') == stat.st_size and
+                entry.get('audio_mtime') == stat.st_mtime and entry.get('audio_sha256')):
+            return entry['audio_sha256']
+        return file_sha256(audio_file)
+
+    def is_fresh(self, bvid, audio_file, compute_type):
+        """判断该视频的字幕是否仍然有效（无需重新识别）"""
+        entry = self.entries.get(bvid)
+        txt_path = os.path.join(SUBTITLE_DIR, f"{bvid}.txt")
+        if not entry or not os.path.exists(txt_path):
+            return False
+        if entry.get('source', 'asr').startswith('native'):
+            return USE_NATIVE_SUBTITLES and file_sha256(txt_path) == entry.get('transcript_sha256')
+        if (entry.get('model_path') != MODEL_PATH or entry.get('compute_type') != compute_type or
+                entry.get('transcribe_mode', 'sequential') != TRANSCRIBE_MODE):
+            return False
+        if file_sha256(txt_path) != entry.get('transcript_sha256'):
+            return False
+        # 音频已被清理时无法比对，视为未变化；音频存在则必须与记录一致
+        if audio_file and os.path.exists(audio_file):
+            if self._audio_hash(audio_file, entry) != entry.get('audio_sha256'):
+                return False
+        return True
+
+    def record(self, bvid, audio_file, compute_type, source="asr"):
+        """
+        处理成功后记录（或刷新）该视频的清单条目并立即落盘。
+        source 为 "asr"（语音识别）或 "native:<语言>"（自带字幕）。
+        """
+        entry = self.entries.get(bvid, {})
+        txt_path = os.path.join(SUBTITLE_DIR, f"{bvid}.txt")
+        new_entry = {
+            'source': source,
+            'model_path': MODEL_PATH,
+            'compute_type': compute_type,
+            'transcribe_mode': TRANSCRIBE_MODE,
+            'transcript_sha256': file_sha256(txt_path),
+            'updated_at': time.strftime("%Y-%m-%d %H:%M:%S")
+        }
+        if audio_file and os.path.exists(audio_file):
+            stat = os.stat(audio_file)
+            new_entry.update({
+                'audio_sha256': self._audio_hash(audio_file, entry),
+                'audio_size': stat.st_size,
+                'audio_mtime': stat.st_mtime
+            })
+        self.entries[bvid] = new_entry
+        self.save()
+
+def transcription_worker(worker_id, task_queue, result_queue, plan, stream_metrics=False):
+    """
+    常驻 worker：启动时加载一次模型，然后循环处理任务，收到 None 时退出。
+    stream_metrics 为 True 时边识别边计算 step3 的基础指标，随结果一起返回
+    （{'text_sha256', 'metrics'}，可直接写入评分缓存，评分时不必再分词）。
+    """
+    model = get_model(plan)
+    scorer = None
+    if stream_metrics:
+        from step3_scorer import VideoScorer
+        scorer = VideoScorer()
+    result_queue.put(("ready", worker_id, None, None, 0.0, None))
+    while True:
+        task = task_queue.get()
+        if task is None:
+            break
+        bvid, title, audio_file = task
+        accumulator = scorer.accumulator() if scorer else None
+        ok, duration = transcribe_single_video(bvid, audio_file, model, accumulator)
+        metrics = None
+        if ok and accumulator is not None:
+            try:
+                metrics = {'text_sha256': accumulator.text_sha256(), 'metrics': accumulator.result()}
+            except Exception as e:
+                logging.warning(f"计算视频 {bvid} 的评分指标失败，将由评分阶段重新计算: {e}")
+        result_queue.put(("done", worker_id, bvid, ok, duration, metrics))
+
+class WorkerSupervisor:
+    """
+    管理常驻 worker 的下载/识别流水线：
+    下载线程池按预取深度提前下载音频，放入就绪队列；识别 worker 从就绪队列取音频。
+    同时检测崩溃，重启 worker 并只重排其正在处理的视频。
+    """
+
+    def __init__(self, plan, max_retries=MAX_RETRIES,
+                 download_concurrency=DOWNLOAD_CONCURRENCY, prefetch_depth=PREFETCH_DEPTH,
+                 on_done=None, stream_metrics=False):
+        self.ctx = multiprocessing.get_context('spawn')
+        self.plan = plan
+        self.num_workers = plan['num_workers']
+        self.max_retries = max_retries
+        self.download_concurrency = max(1, download_concurrency)
+        self.prefetch_depth = max(1, prefetch_depth)
+        self.result_queue = self.ctx.Queue()
+        self.workers = {}    # worker_id -> (进程, 任务队列)
+        self.ready = set()   # 已加载完模型的 worker
+        self.inflight = {}   # worker_id -> 正在处理的 (bvid, title)
+        self.retries = {}    # bvid -> 已重试次数
+        self.startup_failures = 0
+        self.audio_seconds = 0.0  # 已成功识别的音频总时长
+        self.on_done = on_done    # 处理成功回调 on_done(bvid, audio_file, source, metrics)
+        self.stream_metrics = stream_metrics  # worker 是否边识别边计算评分指标（metrics 见 transcription_worker）
+
+    def _start_worker(self, worker_id):
+        task_queue = self.ctx.Queue()
+        proc = self.ctx.Process(
+            target=transcription_worker,
+            args=(worker_id, task_queue, self.result_queue, self.plan, self.stream_metrics),
+            daemon=True
+        )
+        proc.start()
+        self.workers[worker_id] = (proc, task_queue)
+        print(f"worker {worker_id} 已启动（进程 {proc.pid}），正在加载模型...")
+        sys.stdout.flush()
+
+    def _handle_message(self, msg, results):
+        kind, worker_id, bvid, ok, duration, metrics = msg
+        if kind == "ready":
+            self.ready.add(worker_id)
+            self.startup_failures = 0
+        elif kind == "done":
+            task = self.inflight.pop(worker_id, None)
+            results[bvid] = ok
+            if ok:
+                self.audio_seconds += duration
+                if self.on_done and task is not None:
+                    self.on_done(bvid, task[2], "asr", metrics)
+
+    def _drain_messages(self, results):
+        while True:
+            try:
+                msg = self.result_queue.get_nowait()
+            except queue.Empty:
+                return
+            self._handle_message(msg, results)
+
+    def _check_workers(self, ready_audio, results):
+        """检测已退出的 worker：重启它，并把它正在处理的视频重新排队"""
+        for worker_id, (proc, _) in list(self.workers.items()):
+            if proc.is_alive():
+                continue
+            # 先收完它退出前可能已经发出的消息，避免把已完成的视频重复排队
+            self._drain_messages(results)
+            task = self.inflight.pop(worker_id, None)
+            if worker_id not in self.ready:
+                self.startup_failures += 1
+            self.ready.discard(worker_id)
+            print(f"⚠️  worker {worker_id} 异常退出（退出码 {proc.exitcode}），正在重启...")
+            if task is not None:
+                bvid = task[0]
+                self.retries[bvid] = self.retries.get(bvid, 0) + 1
+                if self.retries[bvid] <= self.max_retries:
+                    print(f"  视频 {bvid} 重新排队（第 {self.retries[bvid]} 次重试）")
+                    ready_audio.appendleft(task)
+                else:
+                    print(f"  视频 {bvid} 已重试 {self.max_retries} 次仍失败，放弃")
+                    results[bvid] = False
+                    emit("transcribe", bvid, "failed")
+            if self.startup_failures > self.num_workers * 2:
+                raise RuntimeError("worker 多次在加载模型时退出，请检查 MODEL_PATH / DEVICE 配置")
+            self._start_worker(worker_id)
+        sys.stdout.flush()
+
+    def _collect_downloads(self, downloading, ready_audio, results):
+        """
+        处理已完成的下载阶段：使用自带字幕的视频直接完成，
+        下载了音频的移入就绪队列，失败的直接记为失败
+        """
+        for future in [f for f in downloading if f.done()]:
+            bvid, title = downloading.pop(future)
+            try:
+                prepared = future.result()
+            except Exception as e:
+                print(f"  下载视频 {bvid} 音频时出错: {e}")
+                prepared = None
+            if not prepared:
+                results[bvid] = False
+                continue
+            kind, value = prepared
+            if kind == "native":
+                results[bvid] = True
+                if self.on_done:
+                    self.on_done(bvid, None, f"native:{value}", None)
+            else:
+                ready_audio.append((bvid, title, value))
+
+    def run(self, tasks):
+        """
+        处理全部任务（(bvid, title) 的可迭代对象，可以是边产生边读取的流），返回 {bvid: 是否成功}。
+        任务由单独的线程读取，读取阻塞时不影响下载和识别的调度。
+        """
+        feed = queue.Queue()
+
+        def feed_tasks():
+            try:
+                for task in tasks:
+                    feed.put(task)
+            except Exception as e:
+                print(f"读取任务时出错，停止接收新任务: {e}")
+            finally:
+                feed.put(None)
+
+        threading.Thread(target=feed_tasks, daemon=True).start()
+        source_done = False
+        downloading = {}      # Future -> (bvid, title)
+        ready_audio = deque()  # 已下载、等待识别的 (bvid, title, audio_file)
+        results = {}
+        for worker_id in range(self.num_workers):
+            self._start_worker(worker_id)
+        downloader = ThreadPoolExecutor(max_workers=self.download_concurrency)
+        try:
+            while not source_done or downloading or ready_audio or self.inflight:
+                # 按预取深度补充下载任务，下载与识别并行
+                while not source_done and len(downloading) + len(ready_audio) < self.prefetch_depth:
+                    try:
+                        task = feed.get_nowait()
+                    except queue.Empty:
+                        break
+                    if task is None:
+                        source_done = True
+                        break
+                    bvid, title = task
+                    future = downloader.submit(prepare_video, bvid)
+                    downloading[future] = (bvid, title)
+                self._collect_downloads(downloading, ready_audio, results)
+
+                # 给空闲且已就绪的 worker 派发识别任务
+                for worker_id in sorted(self.ready):
+                    if not ready_audio:
+                        break
+                    if worker_id in self.inflight:
+                        continue
+                    task = ready_audio.popleft()
+                    self.inflight[worker_id] = task
+                    self.workers[worker_id][1].put(task)
+                try:
+                    msg = self.result_queue.get(timeout=0.2)
+                    self._handle_message(msg, results)
+                except queue.Empty:
+                    pass
+                self._check_workers(ready_audio, results)
+        finally:
+            downloader.shutdown(wait=False, cancel_futures=True)
+            self.shutdown()
+        return results
+
+    def shutdown(self):
+        for proc, task_queue in self.workers.values():
+            if proc.is_alive():
+                task_queue.put(None)
+        for proc, _ in self.workers.values():
+            proc.join(timeout=10)
+            if proc.is_alive():
+                proc.terminate()
+        self.workers.clear()
+
+def _stat_or_none(path):
+    try:
+        return os.stat(path)
+    except OSError:
+        return None
+
+def iter_video_stream(path, idle_timeout=STREAM_IDLE_TIMEOUT, poll_interval=0.5, run_id=None):
+    """
+    跟随读取 step1 写出的 JSONL 视频流，边写边读，读到本轮的 end 事件为止。
+    只读本轮的流：指定 run_id 时首行 start 事件的 run_id 必须一致；未指定时只打开开始读取之后修改过的文件，
+    上一轮遗留的旧文件（及 run_id 不符的流）会被跳过，等待 step1 换上新文件。
+    文件被替换（inode 变化）或变短（被原地覆盖）时重新打开，从新文件开头读取；被跳过的文件也据此重新判断。
+    还没写完的末行会等到换行符出现后再解析；无法解析的行跳过。
+    超过 idle_timeout 秒没有新内容（例如爬虫异常退出）时停止等待。
+    """
+    started = time.time()
+    f = None
+    inode = None
+    skipped = None   # 已判定不属于本轮的文件：(inode, 大小)
+    current = None   # 已接受的 start 事件的 run_id
+    partial = b""
+    idle = 0.0
+    try:
+        while True:
+            if f is None:
+                st = _stat_or_none(path)
+                if st is not None and skipped and st.st_ino == skipped[0] and st.st_size >= skipped[1]:
+                    skipped = (st.st_ino, st.st_size)  # 仍是被跳过的文件（可能还在追加），继续等待
+                elif st is not None and (run_id or st.st_mtime >= started):
+                    f = open(path, "rb")
+                    inode = os.fstat(f.fileno()).st_ino
+                    current = None
+                    partial = b""
+            chunk = f.readline() if f is not None else b""
+            if not chunk:
+                if f is not None:
+                    st = _stat_or_none(path)
+                    if st is not None and (st.st_ino != inode or st.st_size < f.tell()):
+                        print(f"视频流 {path} 已被新一轮爬取替换，重新打开")
+                        f.close()
+                        f = None
+                        idle = 0.0
+                        continue
+                if idle >= idle_timeout:
+                    if f is None:
+                        print(f"等待本轮视频流 {path} 超时，停止读取")
+                    else:
+                        print(f"视频流 {path} 已 {idle_timeout} 秒没有新内容，停止读取")
+                    return
+                time.sleep(poll_interval)
+                idle += poll_interval
+                continue
+            idle = 0.0
+            partial += chunk
+            if not partial.endswith(b"\n"):
+                continue  # 末行还没写完整，继续等待
+            line, partial = partial, b""
+            try:
+                record = json.loads(line.decode("utf-8"))
+            except ValueError:
+                print(f"跳过视频流中无法解析的行: {line[:80]!r}")
+                continue
+            event = record.get('event')
+            if current is None:
+                # 首行必须是本轮的 start 事件，否则整个文件都不属于本轮
+                if event == 'start' and (run_id is None or record.get('run_id') == run_id):
+                    current = record.get('run_id')
+                    continue
+                print(f"跳过不属于本轮的视频流（run_id：{record.get('run_id')}），等待新文件")
+                skipped = (inode, os.fstat(f.fileno()).st_size)
+                f.close()
+                f = None
+                continue
+            if event == 'end':
+                if record.get('run_id') == current:
+                    return
+                continue
+            if event:
+                continue
+            yield record
+    finally:
+        if f is not None:
+            f.close()
+
+def iter_tasks(videos, manifest, compute_type, stats, on_skip=None):
+    """
+    产出需要处理的 (bvid, title)，跳过清单中输入未变化的视频；
+    跳过的视频字幕已是最新，若提供 on_skip(bvid, title) 则交给调用方继续处理
+    """
+    for video in videos:
+        bvid = video['bvid']
+        audio_file = find_audio_file(bvid, AUDIO_DIR)
+        if manifest.is_fresh(bvid, audio_file, compute_type):
+            stats['skipped'] += 1
+            emit("manifest", bvid, "skipped")
+            if on_skip:
+                on_skip(bvid, video.get('title', ''))
+            continue
+        yield bvid, video.get('title', '')
 
-def main():
-    input_file = "./data/video_urls.json"
-    if not os.path.exists(input_file):
-        print(f"错误：找不到 {input_file}，请先运行爬虫脚本。")
-        return
+def parse_args():
+    parser = argparse.ArgumentParser(description="下载音频并提取字幕")
+    parser.add_argument("--follow", action="store_true",
+                        help=f"跟随读取 {STREAM_FILE}，爬虫还在运行时就开始处理")
+    parser.add_argument("--run-id", help="--follow 时只读取该轮爬取的视频流（step1 启动时打印）；"
+                                         "不指定时只读取本脚本启动之后写入的视频流")
+    return parser.parse_args()
 
-    with open(input_file, "r", encoding="utf-8") as f:
-        videos = json.load(f)
+def main(follow=False, run_id=None):
+    if follow:
+        print(f"跟随读取视频流 {STREAM_FILE}，收到视频即开始处理")
+        videos = iter_video_stream(STREAM_FILE, run_id=run_id)
+    else:
+        if not os.path.exists(INPUT_FILE):
+            print(f"错误：找不到 {INPUT_FILE}，请先运行爬虫脚本。")
+            return
+        with open(INPUT_FILE, "r", encoding="utf-8") as f:
+            videos = json.load(f)
+        print(f"共 {min(len(videos), MAX_VIDEOS)} 个视频需要处理")
+        emit("step2", outcome="start", total=min(len(videos), MAX_VIDEOS))
 
     os.makedirs(SUBTITLE_DIR, exist_ok=True)
     os.makedirs(AUDIO_DIR, exist_ok=True)
 
-    # 限制处理数量
-    videos_to_process = videos[:MAX_VIDEOS]
-    print(f"共 {len(videos_to_process)} 个视频需要处理")
+    plan = resolve_device_plan(NUM_WORKERS if WORKER_MODE == "persistent" else 1)
+    manifest = Manifest()
 
-    # 准备任务列表：每个任务是一个 (bvid, title) 元组
-    tasks = [(video['bvid'], video.get('title', '')) for video in videos_to_process]
+    # 限制处理数量；任务是 (bvid, title) 元组，按需生成，跳过清单中输入未变化的视频
+    stats = {'skipped': 0}
+    tasks = iter_tasks(itertools.islice(videos, MAX_VIDEOS), manifest, plan['compute_type'], stats)
 
     successful = 0
-    # 使用进程池，每个进程只处理一个任务后重启（maxtasksperchild=1），隔离崩溃
-    with multiprocessing.Pool(processes=1, maxtasksperchild=1) as pool:
-        # starmap 会按顺序提交任务，并等待所有完成，返回结果列表
-        results = pool.starmap(process_single_video, tasks)
-        successful = sum(1 for r in results if r)
+    audio_seconds = None
+    start_time = time.time()
+    if WORKER_MODE == "persistent":
+        # 常驻 worker + 下载流水线：下载与识别并行，每个 worker 只加载一次模型，
+        # 崩溃由 supervisor 重启并重排在途视频
+        print(f"识别设备: {plan['device']}（{plan['compute_type']}），"
+              f"{plan['num_workers']} 个模型实例，每个实例 CPU 线程数: {plan['cpu_threads'] or '自动'}")
+        supervisor = WorkerSupervisor(
+            plan, MAX_RETRIES, DOWNLOAD_CONCURRENCY, PREFETCH_DEPTH,
+            on_done=lambda bvid, audio_file, source, metrics: manifest.record(
+                bvid, audio_file, plan['compute_type'], source)
+        )
+        results = supervisor.run(tasks)
+        successful = sum(1 for r in results.values() if r)
+        audio_seconds = supervisor.audio_seconds
+    else:
+        tasks = list(tasks)
+        # 使用进程池，每个进程只处理一个任务后重启（maxtasksperchild=1），隔离崩溃
+        with multiprocessing.Pool(processes=1, maxtasksperchild=1) as pool:
+            # starmap 会按顺序提交任务，并等待所有完成，返回结果列表
+            results = pool.starmap(process_single_video, tasks)
+            successful = sum(1 for r in results if r)
+        for (bvid, _), source in zip(tasks, results):
+            if source:
+                audio_file = find_audio_file(bvid, AUDIO_DIR) if source == "asr" else None
+                manifest.record(bvid, audio_file, plan['compute_type'], source)
 
-    print(f"\n处理完成，共成功处理 {successful} 个视频，字幕文件保存在 {SUBTITLE_DIR}，音频文件保存在 {AUDIO_DIR}")
+    if stats['skipped']:
+        print(f"清单显示 {stats['skipped']} 个视频的字幕已是最新，已跳过")
+    print(f"\n处理完成，共成功处理 {successful} 个视频（另有 {stats['skipped']} 个无需重新处理），"
+          f"字幕文件保存在 {SUBTITLE_DIR}，音频文件保存在 {AUDIO_DIR}")
+    if audio_seconds is not None:
+        wall_seconds = time.time() - start_time
+        print(f"吞吐量：{audio_seconds:.1f} 秒音频 / {wall_seconds:.1f} 秒耗时 = "
+              f"{audio_seconds / max(wall_seconds, 1e-6):.2f} 音频秒/秒")
     sys.stdout.flush()
     time.sleep(3)  # 等待底层资源释放
 
@@ -124,7 +862,8 @@ if __name__ == "__main__":
     multiprocessing.set_start_method('spawn', force=True)
     try:
         logging.info("主进程开始运行")
-        main()
+        args = parse_args()
+        main(follow=args.follow, run_id=args.run_id)
         logging.info("主进程正常结束")
     except Exception as e:
         logging.exception("主进程发生未捕获异常")
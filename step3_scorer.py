@@ -1,11 +1,21 @@
 import os
+import csv
 import json
 import re
 import time
-import jieba
+import hashlib
+import threading
+import jieba_cache
+import argparse
 import subprocess
+from concurrent.futures import ProcessPoolExecutor
 from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.styles import Font, Alignment
+from openpyxl.utils import get_column_letter
+from progress import emit
+from multi_pattern import MultiPatternCounter
+from result_store import ResultStore, REVIEW_PENDING
 from config import (
     VIRTUAL_WORDS, LOGIC_WORDS, EXCLUDE_PHRASES,
     SCORE_WEIGHTS, DECISION_THRESHOLDS
@@ -14,6 +24,27 @@ from config import (
 SUBTITLE_DIR = "./data/subtitles"
 EXCEL_OUTPUT = "./data/video_scores.xlsx"
 EXCEL_BACKUP_DIR = "./data/excel_backups"  # 备份文件夹
+METRICS_CSV_OUTPUT = "./data/video_metrics.csv"          # 完整指标表（全部基础指标 + 复合分 + 评级）
+METRICS_PARQUET_OUTPUT = "./data/video_metrics.parquet"
+EXPORT_FORMATS = ("csv", "parquet")  # Excel 之外另存的完整指标表格式，可用 --export 覆盖；parquet 需要 pyarrow
+PARQUET_BATCH_ROWS = 10000  # Parquet 每个 row group 的行数，写出时最多缓存这么多行
+WORKERS = 1  # 评分进程数，1 表示在当前进程内串行评分；可用 --workers 覆盖
+SCORE_CACHE_FILE = "./data/score_cache.json"  # 基础指标缓存，字幕未变化的视频不再重新分词
+METRICS_VERSION = 1  # 修改 calculate_basic_metrics 的算法时加一，使旧缓存失效
+CHUNK_CHARS = 64 * 1024  # 计算分词指标时每块的字符数，限制长文本的中间结果大小
+# jieba 分块所用的字符集（与 jieba.re_han_default 一致），分块只在这些字符之外的位置切开
+JIEBA_BLOCK_CHAR = re.compile(r'[\u4E00-\u9FD5a-zA-Z0-9+#&\._%\-]')
+
+REPORT_HEADERS = ["BV号", "信息密度分", "理性思辨分", "体验思辨分", "最终评级"]
+REPORT_WIDTHS = [15, 12, 12, 12, 12]
+METRIC_FIELDS = (
+    'density_virtual', 'density_logic', 'density_question', 'density_firstperson',
+    'vocab_richness', 'density_propernoun', 'length_penalty', 'total_chars'
+)
+# 完整指标表的列：BV号、calculate_basic_metrics 的全部指标、三个复合分和评级
+METRICS_TABLE_FIELDS = ('bvid',) + METRIC_FIELDS + ('info_score', 'rational_score', 'experience_score', 'rating')
+
+_worker_scorer = None  # 进程池 worker 内复用的评分器
 def force_close_office_apps():
     """强制关闭所有 Excel 和 Word 进程（Windows）"""
     try:
@@ -33,10 +64,27 @@ class VideoScorer:
         self.exclude_phrases = set(EXCLUDE_PHRASES)
         self.weights = SCORE_WEIGHTS
         self.thresholds = DECISION_THRESHOLDS
+        # 虚词、逻辑连词和单字标记（设问、第一人称）共用一个计数器，一次统计
+        self.counter = MultiPatternCounter(
+            list(self.virtual_words) + list(self.logic_words) + ['？', '我']
+        )
 
     def calculate_basic_metrics(self, text):
         """计算所有基础指标，返回字典"""
         total_chars = len(text)
+        if total_chars == 0:
+            return self.metrics_from_counts(0, {}, 0, 0, 0)
+
+        # 各词出现次数（与逐个 text.count 的结果相同）
+        counts = self.counter.count(text)
+        # 分词和专有名词候选按块处理，长文本也不会同时生成整篇的分词列表和候选列表
+        tokens = TokenStats(self.exclude_phrases)
+        for i in range(0, total_chars, CHUNK_CHARS):
+            tokens.update(text[i:i + CHUNK_CHARS])
+        return self.metrics_from_counts(total_chars, counts, *tokens.finish())
+
+    def metrics_from_counts(self, total_chars, counts, total_words, unique_words, unique_proper):
+        """由计数结果计算各项基础指标（整篇计算和分块累积共用，保证结果完全一致）"""
         if total_chars == 0:
             return {
                 'density_virtual': 0.0,
@@ -50,30 +98,23 @@ class VideoScorer:
             }
 
         # 1. 虚词密度
-        virtual_count = sum(text.count(word) for word in self.virtual_words)
+        virtual_count = sum(counts[word] for word in self.virtual_words)
         density_virtual = virtual_count / total_chars * 1000
 
         # 2. 逻辑连词密度
-        logic_count = sum(text.count(word) for word in self.logic_words)
+        logic_count = sum(counts[word] for word in self.logic_words)
         density_logic = logic_count / total_chars * 1000
 
         # 3. 设问密度
-        density_question = text.count('？') / total_chars * 1000
+        density_question = counts['？'] / total_chars * 1000
 
         # 4. 第一人称密度
-        density_firstperson = text.count('我') / total_chars * 1000
+        density_firstperson = counts['我'] / total_chars * 1000
 
         # 5. 词汇丰富度（分词后去重）
-        words = jieba.lcut(text)
-        filtered_words = [w for w in words if re.match(r'^[\u4e00-\u9fa5a-zA-Z0-9]+$', w)]
-        total_words = len(filtered_words)
-        unique_words = len(set(filtered_words))
         vocab_richness = unique_words / total_words if total_words > 0 else 0
 
         # 6. 专有名词密度
-        candidates = re.findall(r'[\u4e00-\u9fa5]{2,}', text)
-        proper_candidates = [c for c in candidates if c not in self.exclude_phrases]
-        unique_proper = len(set(proper_candidates))
         density_propernoun = unique_proper / total_chars * 1000
 
         # 7. 文本长度惩罚系数
@@ -90,6 +131,10 @@ class VideoScorer:
             'total_chars': total_chars
         }
 
+    def accumulator(self):
+        """返回分块累积基础指标的 MetricsAccumulator"""
+        return MetricsAccumulator(self)
+
     def compute_composite_scores(self, metrics):
         """计算三个复合维度分"""
         w = self.weights
@@ -158,7 +203,373 @@ class VideoScorer:
         return metrics, composite, rating
 
 
-def main():
+class TokenStats:
+    """
+    分块统计分词和专有名词候选：只保留去重集合和词数，不保存分词列表。
+    jieba 按“分块字符”（汉字、字母、数字等）组成的连续片段分别分词，专有名词候选也是连续汉字，
+    因此只在分块字符之外的位置（标点、空白等）切开时，各段结果合起来与整篇处理完全相同；
+    每块末尾尚未遇到分隔字符的部分留到下一块。
+    """
+
+    def __init__(self, exclude_phrases):
+        self.exclude_phrases = exclude_phrases
+        self.total_words = 0
+        self.vocabulary = set()
+        self.proper_nouns = set()
+        self.pending = ""
+
+    def update(self, chunk):
+        # 只需在新块中找最后一个分隔字符：pending 本身不含分隔字符
+        cut = len(chunk)
+        while cut > 0 and JIEBA_BLOCK_CHAR.match(chunk[cut - 1]):
+            cut -= 1
+        if cut == 0:
+            self.pending += chunk
+            return
+        self._process(self.pending + chunk[:cut])
+        self.pending = chunk[cut:]
+
+    def _process(self, text):
+        for w in jieba_cache.lcut(text):
+            if re.match(r'^[\u4e00-\u9fa5a-zA-Z0-9]+$', w):
+                self.total_words += 1
+                self.vocabulary.add(w)
+        for m in re.finditer(r'[\u4e00-\u9fa5]{2,}', text):
+            if m.group() not in self.exclude_phrases:
+                self.proper_nouns.add(m.group())
+
+    def finish(self):
+        """处理剩余部分，返回 (过滤后词数, 不同词数, 不同专有名词候选数)"""
+        if self.pending:
+            self._process(self.pending)
+            self.pending = ""
+        return self.total_words, len(self.vocabulary), len(self.proper_nouns)
+
+class MetricsAccumulator:
+    """
+    流式基础指标：字幕可以一段一段地 update()，result() 与对拼接后的全文调用
+    calculate_basic_metrics 的结果完全相同。词表计数携带自动机状态，跨段的词也能识别；
+    同时累计全文的 SHA-256，可直接作为评分缓存的键。step2 识别时可边出字幕边计算。
+    """
+
+    def __init__(self, scorer):
+        self.scorer = scorer
+        self.patterns = scorer.counter.stream()
+        self.tokens = TokenStats(scorer.exclude_phrases)
+        self.total_chars = 0
+        self.sha256 = hashlib.sha256()
+
+    def update(self, text):
+        self.total_chars += len(text)
+        self.patterns.feed(text)
+        self.tokens.update(text)
+        self.sha256.update(text.encode("utf-8"))
+
+    def text_sha256(self):
+        return self.sha256.hexdigest()
+
+    def result(self):
+        return self.scorer.metrics_from_counts(
+            self.total_chars, self.patterns.counts(), *self.tokens.finish()
+        )
+
+class MetricsCache:
+    """
+    基础指标缓存（JSON 文件）：每个 bvid 记录字幕内容哈希和 calculate_basic_metrics 的结果。
+    字幕未变化时直接复用指标，完全不加载 jieba；权重和阈值不参与缓存，修改后只需重新计算复合分和评级。
+    词表（虚词、逻辑连词、排除短语）、jieba 词典或指标算法版本变化时，整个缓存失效。
+    """
+
+    def __init__(self, path=SCORE_CACHE_FILE, fingerprint=None):
+        self.path = path
+        self.fingerprint = fingerprint or scoring_fingerprint()
+        self.entries = {}
+        self.lock = threading.Lock()  # 流水线中多个评分线程共用
+        self.stats = {'hits': 0, 'misses': 0, 'invalidated': 0}
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"读取评分缓存 {path} 失败，将重新建立: {e}")
+                return
+            if data.get('fingerprint') == self.fingerprint:
+                self.entries = data.get('entries', {})
+            else:
+                self.stats['invalidated'] = len(data.get('entries', {}))
+
+    def get(self, bvid, text_hash):
+        with self.lock:
+            entry = self.entries.get(bvid)
+            if entry and entry.get('text_sha256') == text_hash:
+                self.stats['hits'] += 1
+                return entry['metrics']
+            self.stats['misses'] += 1
+            return None
+
+    def put(self, bvid, text_hash, metrics):
+        with self.lock:
+            self.entries[bvid] = {'text_sha256': text_hash, 'metrics': metrics}
+
+    def save(self):
+        """原子写入缓存文件"""
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with self.lock:
+            data = {'fingerprint': self.fingerprint, 'entries': self.entries}
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+
+    def summary(self):
+        s = self.stats
+        lookups = s['hits'] + s['misses']
+        text = f"评分缓存：命中 {s['hits']}/{lookups}，重新计算 {s['misses']}，共 {len(self.entries)} 条"
+        if s['invalidated']:
+            text += f"（词表、jieba 词典或指标算法已变化，旧缓存 {s['invalidated']} 条已失效）"
+        return text
+
+def scoring_fingerprint():
+    """决定基础指标的全部输入（不含字幕本身）的指纹"""
+    payload = {
+        'metrics_version': METRICS_VERSION,
+        'virtual_words': sorted(VIRTUAL_WORDS),
+        'logic_words': sorted(LOGIC_WORDS),
+        'exclude_phrases': sorted(EXCLUDE_PHRASES),
+        'jieba_dictionary': jieba_cache.dictionary_fingerprint(),  # 含 jieba 版本和用户词典
+    }
+    return hashlib.sha256(json.dumps(payload, ensure_ascii=False, sort_keys=True).encode("utf-8")).hexdigest()
+
+def text_sha256(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def read_subtitle(bvid, subtitle_dir=None):
+    """读取字幕文件（默认在 SUBTITLE_DIR 中），失败时打印原因、上报失败事件并返回 None"""
+    txt_path = os.path.join(subtitle_dir or SUBTITLE_DIR, f"{bvid}.txt")
+    try:
+        with open(txt_path, "r", encoding="utf-8") as f:
+            return f.read()
+    except Exception as e:
+        print(f"读取文件 {bvid}.txt 失败: {e}")
+        emit("score", bvid, "failed")
+        return None
+
+def build_row(scorer, bvid, text, metrics, start=None):
+    """由基础指标计算复合分和评级，返回 Excel 的一行 [BV号, 信息密度分, 理性思辨分, 体验思辨分, 最终评级]"""
+    composite = scorer.compute_composite_scores(metrics)
+    rating = scorer.decide_rating(composite, metrics)
+    emit("score", bvid, "ok", nbytes=len(text.encode("utf-8")),
+         elapsed=time.time() - start if start else None, rating=rating)
+    return [
+        bvid,
+        composite['info_score'],
+        composite['rational_score'],
+        composite['experience_score'],
+        rating
+    ]
+
+def score_file(scorer, bvid, subtitle_dir=None, cache=None):
+    """
+    读取并评分单个字幕文件，返回 (Excel 的一行, 基础指标, 字幕哈希)，读取失败返回 (None, None, None)。
+    提供 cache 时，字幕未变化则复用缓存的基础指标。
+    """
+    start = time.time()
+    text = read_subtitle(bvid, subtitle_dir)
+    if text is None:
+        return None, None, None
+    text_hash = text_sha256(text)
+    metrics = cache.get(bvid, text_hash) if cache else None
+    if metrics is None:
+        metrics = scorer.calculate_basic_metrics(text)
+        if cache:
+            cache.put(bvid, text_hash, metrics)
+    return build_row(scorer, bvid, text, metrics, start), metrics, text_hash
+
+def init_score_worker():
+    """进程池 worker 初始化：每个进程只加载一次 jieba 词典（从预构建缓存）并创建一个评分器"""
+    global _worker_scorer
+    jieba_cache.get_tokenizer()
+    _worker_scorer = VideoScorer()
+
+def metrics_in_worker(text):
+    return _worker_scorer.calculate_basic_metrics(text)
+
+def iter_scored_rows(bvids, workers=WORKERS, cache=None):
+    """
+    按 bvids 的顺序产出 (bvid, Excel 行, 基础指标, 字幕哈希)，读取失败的视频后三项为 None。
+    workers > 1 时，缓存未命中的字幕分片交给进程池计算基础指标（jieba 分词是主要耗时），
+    复合分和评级在主进程按输入顺序计算，结果与串行输出完全一致。
+    """
+    scorer = VideoScorer()
+    if workers <= 1:
+        for bvid in bvids:
+            yield (bvid,) + score_file(scorer, bvid, cache=cache)
+        return
+
+    # 先读入全部字幕并查缓存，只把未命中的交给进程池
+    entries = []   # (bvid, text, 字幕哈希, 缓存的指标)
+    misses = []
+    for bvid in bvids:
+        text = read_subtitle(bvid)
+        if text is None:
+            entries.append((bvid, None, None, None))
+            continue
+        text_hash = text_sha256(text)
+        metrics = cache.get(bvid, text_hash) if cache else None
+        if metrics is None:
+            misses.append(text)
+        entries.append((bvid, text, text_hash, metrics))
+    if not misses:
+        for bvid, text, text_hash, metrics in entries:
+            if text is None:
+                yield bvid, None, None, None
+            else:
+                yield bvid, build_row(scorer, bvid, text, metrics), metrics, text_hash
+        return
+
+    chunksize = max(1, len(misses) // (workers * 8))  # 分片不宜过大，避免最后几个 worker 空等
+    with ProcessPoolExecutor(max_workers=min(workers, len(misses)), initializer=init_score_worker) as pool:
+        computed = pool.map(metrics_in_worker, misses, chunksize=chunksize)
+        for bvid, text, text_hash, metrics in entries:
+            if text is None:
+                yield bvid, None, None, None
+                continue
+            if metrics is None:
+                metrics = next(computed)
+                if cache:
+                    cache.put(bvid, text_hash, metrics)
+            yield bvid, build_row(scorer, bvid, text, metrics), metrics, text_hash
+
+def create_workbook(extra_headers=()):
+    """
+    创建评分结果工作簿（去掉标题列），返回 (wb, ws)。
+    使用只写模式：每行 append 后直接写入临时文件，不在内存中保留单元格对象，
+    数万行时保存也很快；因此只能用 ws.append 按顺序追加整行（超链接等用 WriteOnlyCell）。
+    """
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("评分结果")
+    headers = REPORT_HEADERS + list(extra_headers)
+    # 只写模式下列宽必须在写入第一行之前设置
+    for i, width in enumerate(REPORT_WIDTHS + [12] * len(extra_headers), start=1):
+        ws.column_dimensions[get_column_letter(i)].width = width
+    ws.append(headers)
+    return wb, ws
+
+class MetricsExporter:
+    """
+    把完整指标表（见 METRICS_TABLE_FIELDS）逐行写出为 CSV 和/或 Parquet，下游工具不必解析 xlsx。
+    CSV 逐行写入；Parquet 每 PARQUET_BATCH_ROWS 行写一个 row group，内存占用与视频数无关。
+    先写临时文件，close() 时再替换正式文件，中途出错不会留下不完整的结果。
+    """
+
+    def __init__(self, formats=EXPORT_FORMATS, csv_path=METRICS_CSV_OUTPUT, parquet_path=METRICS_PARQUET_OUTPUT):
+        self.outputs = []   # (临时文件, 正式文件)
+        self.csv_file = None
+        self.csv_writer = None
+        self.parquet_writer = None
+        self.batch = []
+        if "csv" in formats:
+            os.makedirs(os.path.dirname(csv_path) or ".", exist_ok=True)
+            # utf-8-sig：Windows 上用 Excel 直接打开也不会乱码
+            self.csv_file = open(csv_path + ".tmp", "w", newline="", encoding="utf-8-sig")
+            self.csv_writer = csv.writer(self.csv_file)
+            self.csv_writer.writerow(METRICS_TABLE_FIELDS)
+            self.outputs.append((csv_path + ".tmp", csv_path))
+        if "parquet" in formats:
+            try:
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+            except ImportError:
+                print("未安装 pyarrow，跳过 Parquet 导出（pip install pyarrow）")
+            else:
+                self.pa = pa
+                self.schema = pa.schema(
+                    [('bvid', pa.string())] +
+                    [(name, pa.int64() if name == 'total_chars' else pa.float64()) for name in METRIC_FIELDS] +
+                    [(name, pa.float64()) for name in ('info_score', 'rational_score', 'experience_score')] +
+                    [('rating', pa.string())]
+                )
+                os.makedirs(os.path.dirname(parquet_path) or ".", exist_ok=True)
+                self.parquet_writer = pq.ParquetWriter(parquet_path + ".tmp", self.schema)
+                self.outputs.append((parquet_path + ".tmp", parquet_path))
+
+    def write(self, row, metrics):
+        """写入一个视频：row 为 Excel 的一行（BV号、三个复合分、评级），metrics 为基础指标"""
+        record = [row[0]] + [metrics[name] for name in METRIC_FIELDS] + list(row[1:5])
+        if self.csv_writer:
+            self.csv_writer.writerow(record)
+        if self.parquet_writer:
+            self.batch.append(record)
+            if len(self.batch) >= PARQUET_BATCH_ROWS:
+                self._flush()
+
+    def _flush(self):
+        if self.batch:
+            columns = list(zip(*self.batch))
+            self.parquet_writer.write_table(self.pa.Table.from_arrays(
+                [self.pa.array(col, type=field.type) for col, field in zip(columns, self.schema)],
+                schema=self.schema
+            ))
+            self.batch = []
+
+    def close(self):
+        """写完剩余数据并替换正式文件，返回已保存的文件路径列表"""
+        if self.csv_file:
+            self.csv_file.close()
+        if self.parquet_writer:
+            self._flush()
+            self.parquet_writer.close()
+        for tmp_path, path in self.outputs:
+            os.replace(tmp_path, path)
+        return [path for _, path in self.outputs]
+
+def word_link_cell(ws, word_path):
+    """只写工作表中指向 Word 文档的超链接单元格"""
+    cell = WriteOnlyCell(ws, value="打开文档")
+    cell.hyperlink = os.path.abspath(os.path.join(".", "data", word_path))
+    cell.font = Font(color="0000FF", underline="single")
+    return cell
+
+def export_reports(store, excel_path=None, export_formats=EXPORT_FORMATS):
+    """
+    由结果库一次性生成 Excel 报告（评级为审核后的最终评级，已审核的附 Word 文件链接）和完整指标表。
+    返回 (导出行数, 完整指标表文件列表)。
+    """
+    wb, ws = create_workbook(extra_headers=["Word文件"])
+    exporter = MetricsExporter(export_formats)
+    count = 0
+    for result in store.iter_results():
+        row = [result['bvid'], result['info_score'], result['rational_score'], result['experience_score'],
+               result['final_rating'] or result['rating']]
+        if result['word_path']:
+            row.append(word_link_cell(ws, result['word_path']))
+        ws.append(row)
+        exporter.write(row, result)
+        count += 1
+    wb.save(excel_path or EXCEL_OUTPUT)
+    return count, exporter.close()
+
+def parse_export_formats(value):
+    """解析 --export 参数，如 "csv,parquet"；"none" 表示只生成 Excel"""
+    formats = [f.strip().lower() for f in value.split(",") if f.strip()]
+    if formats == ["none"]:
+        return ()
+    unknown = [f for f in formats if f not in ("csv", "parquet")]
+    if unknown:
+        raise argparse.ArgumentTypeError(f"不支持的导出格式：{', '.join(unknown)}（可用 csv、parquet、none）")
+    return tuple(formats)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="对字幕评分并生成 Excel")
+    parser.add_argument("--workers", type=int, default=WORKERS,
+                        help=f"评分进程数（默认 {WORKERS}，即串行）；jieba 分词是主要耗时，可设为 CPU 核心数")
+    parser.add_argument("--no-cache", action="store_true",
+                        help=f"不使用也不更新基础指标缓存 {SCORE_CACHE_FILE}")
+    parser.add_argument("--export", type=parse_export_formats, default=EXPORT_FORMATS,
+                        help=f"Excel 之外另存完整指标表的格式，逗号分隔（默认 {','.join(EXPORT_FORMATS)}；none 表示不导出）")
+    return parser.parse_args()
+
+def main(workers=WORKERS, use_cache=True, export_formats=EXPORT_FORMATS):
     force_close_office_apps()  # 在开始前关闭 Office 进程
     if not os.path.exists(SUBTITLE_DIR):
         print(f"错误：字幕文件夹 {SUBTITLE_DIR} 不存在，请先运行 step2。")
@@ -170,45 +581,39 @@ def main():
         print("字幕文件夹中没有 .txt 文件，退出。")
         return
 
-    print(f"找到 {len(txt_files)} 个字幕文件，开始评分...")
-
-    # 准备 Excel（去掉标题列）
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "评分结果"
-    headers = ["BV号", "信息密度分", "理性思辨分", "体验思辨分", "最终评级"]
-    ws.append(headers)
-    ws.column_dimensions['A'].width = 15
-    for col in ['B','C','D','E']:
-        ws.column_dimensions[col].width = 12
+    print(f"找到 {len(txt_files)} 个字幕文件，开始评分（{workers} 个进程）...")
+    emit("step3", outcome="start", total=len(txt_files))
 
-    scorer = VideoScorer()
     processed = 0
+    bvids = [filename.replace('.txt', '') for filename in txt_files]
+    cache = MetricsCache() if use_cache else None
+    store = ResultStore()
 
-    for filename in txt_files:
-        bvid = filename.replace('.txt', '')
-        txt_path = os.path.join(SUBTITLE_DIR, filename)
-        try:
-            with open(txt_path, "r", encoding="utf-8") as f:
-                text = f.read()
-        except Exception as e:
-            print(f"读取文件 {filename} 失败: {e}")
+    # 每评完一个视频就写入结果库（单行事务），中途中断也不会丢失已完成的结果
+    for bvid, row, metrics, text_hash in iter_scored_rows(bvids, workers, cache):
+        if row is None:
             continue
-
-        metrics, composite, rating = scorer.score_video(text)
-        ws.append([
-            bvid,
-            composite['info_score'],
-            composite['rational_score'],
-            composite['experience_score'],
-            rating
-        ])
+        store.save_score(bvid, row, metrics, text_hash)
         processed += 1
-        print(f"已评分 ({processed}/{len(txt_files)})：{bvid} -> {rating}")
+        print(f"已评分 ({processed}/{len(txt_files)})：{bvid} -> {row[-1]}")
+
+    if cache:
+        cache.save()
+        print(cache.summary())
+
+    removed = store.prune(bvids)
+    if removed:
+        print(f"已从结果库移除 {removed} 个字幕已不存在的视频")
+    pending = store.review_counts().get(REVIEW_PENDING, 0)
+    print(f"评分完成，结果已写入 {store.path}，待审核 S/A 档 {pending} 个")
 
-    # 保存新文件
-    wb.save(EXCEL_OUTPUT)
-    print(f"评分完成，结果已保存到 {EXCEL_OUTPUT}")
+    # Excel 和完整指标表由结果库导出
+    count, paths = export_reports(store, export_formats=export_formats)
+    store.close()
+    print(f"已导出 {count} 行到 {EXCEL_OUTPUT}")
+    for path in paths:
+        print(f"完整指标表已保存到 {path}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    args = parse_args()
+    main(workers=args.workers, use_cache=not args.no_cache, export_formats=args.export)
\ No newline at end of file
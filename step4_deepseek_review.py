@@ -2,39 +2,139 @@ import os
 import re
 import requests
 import time
+import logging
+import argparse
+import threading
 import subprocess
-from openpyxl import load_workbook
-from openpyxl.styles import Font
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
 from docx import Document
 from docx.shared import Pt
 from docx.oxml.ns import qn
-from config import DEEPSEEK_API_KEY, DEEPSEEK_API_URL
+import step3_scorer
+import token_budget
+from config import DEEPSEEK_API_KEY, DEEPSEEK_API_URL, RESULT_DB_PATH
+from progress import emit
+from rate_limit import TokenBucket
+from response_cache import ResponseCache, request_key
+from result_store import ResultStore, REVIEW_DONE
 
 EXCEL_FILE = "./data/video_scores.xlsx"
 WORD_DIR = "./data/word_reviews"
 SUBTITLE_DIR = "./data/subtitles"
 
-def call_deepseek(prompt, max_retries=2):
-    """调用 DeepSeek API，返回回复文本"""
-    headers = {
-        "Authorization": f"Bearer {DEEPSEEK_API_KEY}",
-        "Content-Type": "application/json"
-    }
+# ==================== 配置 ====================
+REVIEW_CONCURRENCY = 4       # 同时审核的视频数（每个视频依次调用立场检测和审核两次 API），可用 --concurrency 覆盖
+REQUESTS_PER_MINUTE = 60     # 所有审核线程合计每分钟最多发出的 API 请求数（含重试），可用 --rpm 覆盖
+BURST = 4                    # 令牌桶容量：允许的瞬时突发请求数
+POOL_SIZE = 8                # 连接池保持的长连接数下限，实际取 max(POOL_SIZE, 并发数 × SUMMARY_CONCURRENCY)
+MODEL = "deepseek-chat"
+TEMPERATURE = 0.7
+MAX_TOKENS = 4000
+REQUEST_TIMEOUT = 60         # 请求超时的基础秒数，另按 max_tokens 加上生成回复所需的时间
+OUTPUT_TOKENS_PER_SECOND = 30  # 估算的回复生成速度（token/秒），用于计算上述附加时间
+PROMPT_TOKEN_BUDGET = 24000  # 单个提示词的 token 上限，超出时先把文案分段摘要，再用摘要审核
+CHUNK_TOKENS = 6000          # 分段摘要时每段文案的 token 数
+SUMMARY_MAX_TOKENS = 1000    # 每段摘要的回复上限
+SUMMARY_CONCURRENCY = 4      # 同一视频同时摘要的段数（请求仍受 --rpm 限制）
+MAX_REDUCE_ROUNDS = 3        # 摘要拼接后仍超出预算时再摘要，最多进行的轮数
+RESPONSE_CACHE_FILE = "./data/deepseek_cache.db"  # 回复缓存：同一请求（模型、提示词、参数都相同）直接复用上次的回复
+RESPONSE_CACHE_MAX_MB = 200                       # 缓存上限，超出时淘汰最久未使用的回复；可用 --no-cache 关闭缓存
+# =============================================
+
+_session = None
+_session_lock = threading.Lock()
+_pool_size = POOL_SIZE
+_limiter = TokenBucket(REQUESTS_PER_MINUTE / 60, BURST)
+_response_cache = None  # open_response_cache() 打开后 call_deepseek 才使用缓存
+
+def get_session():
+    """所有审核线程共用的 requests.Session：复用长连接，省去每次请求的 TCP/TLS 握手"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=_pool_size)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.headers.update({
+                "Authorization": f"Bearer {DEEPSEEK_API_KEY}",
+                "Content-Type": "application/json"
+            })
+            _session = session
+        return _session
+
+def set_concurrency(concurrency):
+    """
+    按审核并发数调整连接池大小：每个审核线程最多同时发出 SUMMARY_CONCURRENCY 个分段摘要请求，
+    连接池不小于最大同时请求数，长连接才不会用完即弃
+    """
+    global _session, _pool_size
+    size = max(POOL_SIZE, max(1, concurrency) * SUMMARY_CONCURRENCY)
+    with _session_lock:
+        if size != _pool_size:
+            _pool_size = size
+            if _session is not None:
+                _session.close()
+                _session = None
+
+def set_rate_limit(requests_per_minute, burst=BURST):
+    """修改所有线程共用的每分钟请求数上限"""
+    global _limiter
+    _limiter = TokenBucket(requests_per_minute / 60, burst)
+
+def open_response_cache(enabled=True):
+    """打开回复缓存（enabled 为 False 时不使用缓存），返回缓存对象或 None"""
+    global _response_cache
+    if enabled and _response_cache is None:
+        _response_cache = ResponseCache(RESPONSE_CACHE_FILE, RESPONSE_CACHE_MAX_MB * 1024 * 1024)
+    return _response_cache
+
+def close_response_cache():
+    """打印本次运行的缓存统计并关闭缓存"""
+    global _response_cache
+    if _response_cache is not None:
+        print(_response_cache.summary())
+        _response_cache.close()
+        _response_cache = None
+
+def call_deepseek(prompt, max_retries=2, max_tokens=MAX_TOKENS):
+    """
+    调用 DeepSeek API，返回回复文本；每次请求（含重试）先从共用的令牌桶取令牌。
+    打开了回复缓存时，相同的请求直接返回缓存的回复，不发请求也不占用令牌。
+    """
     payload = {
-        "model": "deepseek-chat",
+        "model": MODEL,
         "messages": [{"role": "user", "content": prompt}],
-        "temperature": 0.7,
-        "max_tokens": 4000
+        "temperature": TEMPERATURE,
+        "max_tokens": max_tokens
     }
+    timeout = REQUEST_TIMEOUT + max_tokens / OUTPUT_TOKENS_PER_SECOND
+    cache = _response_cache
+    key = request_key(MODEL, prompt, TEMPERATURE, max_tokens) if cache else None
+    if cache:
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+    session = get_session()
     for attempt in range(max_retries):
+        _limiter.acquire()
         try:
-            resp = requests.post(DEEPSEEK_API_URL, json=payload, headers=headers, timeout=60)
+            start = time.time()
+            resp = session.post(DEEPSEEK_API_URL, json=payload, timeout=timeout)
             resp.raise_for_status()
             result = resp.json()
-            return result['choices'][0]['message']['content']
+            content = result['choices'][0]['message']['content']
+            if cache:
+                cache.put(key, content, result.get('usage'), time.time() - start)
+            return content
         except Exception as e:
             print(f"  API 调用失败 (尝试 {attempt+1}/{max_retries}): {e}")
-            time.sleep(2)
+            # 被限流（429）时按服务端给出的 Retry-After 等待
+            response = getattr(e, 'response', None)
+            retry_after = response.headers.get('Retry-After', '') if response is not None else ''
+            time.sleep(float(retry_after) if retry_after.replace('.', '', 1).isdigit() else 2)
     return None
 
 def clean_text(text):
@@ -55,10 +155,16 @@ def generate_word(bvid, ai_review):
     doc.save(filepath)
     return os.path.relpath(filepath, start="./data").replace("\\", "/")
 
-def build_s_prompt(title, subtitle):
-    """构建 S 档提示词"""
-    total_chars = len(subtitle)
-    target_len = max(total_chars // 2, 500)
+def transcript_heading(digest, heading="文案全文："):
+    """提示词中文案部分的标题；digest 为 True 时说明下面是分段摘要而非原文"""
+    if digest:
+        return "文案分段摘要（原文过长，以下为按顺序逐段提炼的要点和原句摘录）："
+    return heading
+
+def build_s_prompt(title, subtitle, total_chars=None, digest=False):
+    """构建 S 档提示词（total_chars 为原文字数；要求的评价字数不超过 MAX_TOKENS 能容纳的长度）"""
+    total_chars = total_chars or len(subtitle)
+    target_len = min(max(total_chars // 2, 500), token_budget.max_output_chars(MAX_TOKENS))
     prompt = f"""你是一个专业的视频内容分析师，熟悉视频质量的分级标准。请对以下B站视频的文案进行分析，并回答七个问题。
 
 【S档视频的核心特征】
@@ -71,7 +177,7 @@ def build_s_prompt(title, subtitle):
 - 结合现实，有实用价值：联系现代人的职场、人生选择，让人感觉“有用”。
 
 视频标题：{title}
-文案全文：
+{transcript_heading(digest)}
 {subtitle}
 
 请基于以上信息，用流畅的中文输出你的评价，并**按顺序**回答以下问题：
@@ -91,7 +197,7 @@ def build_s_prompt(title, subtitle):
 请在最末尾单独一行以“是否符合S档：是”或“是否符合S档：否”的格式给出结论。"""
     return prompt
 
-def build_a_prompt(title, subtitle):
+def build_a_prompt(title, subtitle, digest=False):
     """构建 A 档提示词"""
     prompt = f"""你是一个专业的视频内容分析师，熟悉视频质量的分级标准。请对以下B站视频的文案进行分析，并回答六个问题。
 
@@ -118,7 +224,7 @@ def build_a_prompt(title, subtitle):
 - A档必须包含超越资讯整合的、具有个人思考深度的观点。
 
 视频标题：{title}
-文案全文：
+{transcript_heading(digest)}
 {subtitle}
 
 请基于以上信息，用流畅的中文输出你的评价，并**按顺序**回答以下问题：
@@ -137,7 +243,7 @@ def build_a_prompt(title, subtitle):
 请在最末尾单独一行以“是否符合A档：是”或“是否符合A档：否”的格式给出结论。如果符合，请在下一行以“具体档次：A(体验)”或“具体档次：A(分析)”的格式给出具体档次。"""
     return prompt
 # ================== 新增：立场检测与批判函数 ==================
-def build_stance_check_prompt(title, subtitle):
+def build_stance_check_prompt(title, subtitle, digest=False):
     """构建立场检测提示词"""
     prompt = f"""你是一个政治立场审查员。请分析以下视频文案，判断是否存在以下问题：
 - 断章取义地歪曲事实
@@ -148,22 +254,42 @@ def build_stance_check_prompt(title, subtitle):
 如果存在上述任何一种情况，请在最后一行输出“立场判断：是”；否则输出“立场判断：否”。无需输出其他分析。
 
 视频标题：{title}
-文案：
+{transcript_heading(digest, "文案：")}
 {subtitle}
 """
     return prompt
 
-def build_critique_prompt(title, subtitle):
+def build_critique_prompt(title, subtitle, digest=False):
     """构建暴力批判提示词"""
     prompt = f"""你是一个立场坚定的爱国者。以下视频文案存在恶意歪曲事实、侮辱国家/政府/军队、阴阳怪气等问题。请你以最严厉的语气驳斥其错误逻辑，揭露其荒谬之处，并指出正确的立场。请用批判性的语言，有理有据地反驳，但不要过度情绪化。
 
 视频标题：{title}
-文案：
+{transcript_heading(digest, "文案：")}
 {subtitle}
 
 请直接开始你的批判："""
     return prompt
 
+def build_chunk_summary_prompt(title, index, count, chunk):
+    """构建分段摘要提示词（长文案先逐段摘要，再用拼接的摘要做立场检测和审核）"""
+    prompt = f"""你是一个严谨的视频文案整理员。下面是B站视频文案的第 {index}/{count} 段（原文过长，已按顺序切分）。请提炼这一段的内容，供后续审核使用：
+- 按原文顺序列出主要观点、论证过程和引用的案例、史料、数据，保留因果和转折关系；
+- 保留作者的立场、态度和语气；涉及国家、政府、军队或政策的评价，以及讽刺、影射、攻击性的措辞，请原句摘录；
+- 不要评价，不要补充原文没有的内容，篇幅控制在 {token_budget.max_output_chars(SUMMARY_MAX_TOKENS)} 字以内。
+
+视频标题：{title}
+文案第 {index}/{count} 段：
+{chunk}
+
+请直接输出这一段的摘要："""
+    return prompt
+
+def build_review_prompt(title, rating, material, total_chars, digest=False):
+    """按评级构建 S 档或 A 档审核提示词"""
+    if rating.startswith('S'):
+        return build_s_prompt(title, material, total_chars, digest)
+    return build_a_prompt(title, material, digest)
+
 def force_close_office_apps():
     """强制关闭所有 Excel 和 Word 进程（Windows）"""
     try:
@@ -175,136 +301,194 @@ def force_close_office_apps():
     except Exception as e:
         print(f"关闭进程时出错: {e}")
 
-def main():
-    force_close_office_apps()   # 在脚本一开始就尝试关闭 Office 进程
-    # 检查 Excel 是否存在
-    if not os.path.exists(EXCEL_FILE):
-        print(f"错误：找不到 {EXCEL_FILE}，请先运行评分脚本。")
-        return
-
-    wb = load_workbook(EXCEL_FILE)
-    ws = wb.active
-    # 获取表头
-    headers = [cell.value for cell in ws[1]]   # 定义 headers
-    try:
-        col_bvid = headers.index("BV号") + 1
-    except ValueError:
-        print("Excel 表头缺少 BV 号列，无法处理。")
-        return
-    try:
-        col_title = headers.index("标题") + 1
-    except ValueError:
-        col_title = None  # 标题列不存在，后续将标题设为未知
+def summarize_chunks(title, chunks):
+    """并发摘要各段文案，按原顺序返回摘要列表；任一段失败返回 None"""
+    def summarize(item):
+        index, chunk = item
+        return call_deepseek(build_chunk_summary_prompt(title, index, len(chunks), chunk),
+                             max_tokens=SUMMARY_MAX_TOKENS)
+
+    with ThreadPoolExecutor(max_workers=min(SUMMARY_CONCURRENCY, len(chunks)), thread_name_prefix="摘要") as pool:
+        summaries = list(pool.map(summarize, enumerate(chunks, 1)))
+    if not all(summaries):
+        return None
+    return summaries
+
+def prepare_transcript(title, rating, subtitle):
+    """
+    发送前估算审核提示词的 token 数：未超出 PROMPT_TOKEN_BUDGET 时原样使用字幕；
+    否则按 CHUNK_TOKENS 分段并发摘要，拼接后的摘要仍超出预算时再摘要，最多 MAX_REDUCE_ROUNDS 轮。
+    返回 (文案, 是否为摘要)；摘要失败，或 MAX_REDUCE_ROUNDS 轮后仍超出预算时返回 None。
+    """
+    material, digest = subtitle, False
+    round_no = 0
+    while True:
+        tokens = token_budget.count_tokens(build_review_prompt(title, rating, material, len(subtitle), digest))
+        if tokens <= PROMPT_TOKEN_BUDGET:
+            break
+        if round_no >= MAX_REDUCE_ROUNDS:
+            print(f"  摘要 {MAX_REDUCE_ROUNDS} 轮后审核提示词仍约 {tokens} token，超出预算 {PROMPT_TOKEN_BUDGET}")
+            return None
+        round_no += 1
+        chunks = token_budget.split_by_tokens(material, CHUNK_TOKENS)
+        print(f"  审核提示词约 {tokens} token，超出预算 {PROMPT_TOKEN_BUDGET}，分 {len(chunks)} 段摘要（第 {round_no} 轮）")
+        summaries = summarize_chunks(title, chunks)
+        if summaries is None:
+            return None
+        material = "\n\n".join(f"【第 {i}/{len(summaries)} 段】\n{summary.strip()}"
+                                for i, summary in enumerate(summaries, 1))
+        digest = True
+    if digest:
+        print(f"  文案约 {token_budget.count_tokens(subtitle)} token，摘要后约 {token_budget.count_tokens(material)} token")
+    return material, digest
+
+def review_one(bvid, title, rating, subtitle):
+    """
+    审核单个 S/A 档视频：先做立场检测，不通过则生成批判文档并把评级改为 X，
+    否则按评级生成审核文档。成功返回 (Word 相对路径, 最终评级)，API 调用失败返回 None。
+    """
+    start = time.time()
+    # 超长文案先分段摘要，立场检测、批判和审核都使用摘要
+    prepared = prepare_transcript(title, rating, subtitle)
+    if prepared is None:
+        print(f"  文案未能在 token 预算内完成分段摘要，跳过视频 {bvid}")
+        emit("review", bvid, "failed", elapsed=time.time() - start)
+        return None
+    material, digest = prepared
+
+    # ========== 立场检测 ==========
+    stance_prompt = build_stance_check_prompt(title, material, digest)
+    stance_reply = call_deepseek(stance_prompt)
+    if not stance_reply:
+        print(f"  立场检测 API 调用失败，跳过视频 {bvid}")
+        emit("review", bvid, "failed", elapsed=time.time() - start)
+        return None
+
+    # 解析立场判断
+    stance_passed = True  # 默认通过
+    if "立场判断：是" in stance_reply:
+        stance_passed = False
+    elif "立场判断：否" in stance_reply:
+        stance_passed = True
+    else:
+        # 未按格式输出，记录警告后视为通过（保守处理）
+        print(f"  警告：立场检测回复格式异常，将按通过处理。回复片段：{stance_reply[:100]}")
+        stance_passed = True
+
+    if not stance_passed:
+        # 立场不正 → 暴力批判模式
+        print(f"  视频 {bvid} 立场不正，启动批判模式...")
+        critique_prompt = build_critique_prompt(title, material, digest)
+        critique_reply = call_deepseek(critique_prompt)
+        if not critique_reply:
+            print(f"  批判生成失败，跳过")
+            emit("review", bvid, "failed", elapsed=time.time() - start)
+            return None
+        word_path = generate_word(bvid, critique_reply)
+        print(f"  已生成批判文档，评级改为 X")
+        emit("review", bvid, "ok", elapsed=time.time() - start, rating="X")
+        return word_path, "X"  # 不再进行正常审核
+    # ========== 立场检测结束 ==========
+
+    # 根据评级选择提示词
+    prompt = build_review_prompt(title, rating, material, len(subtitle), digest)
+
+    # 调用 API
+    reply = call_deepseek(prompt)
+    if not reply:
+        print(f"  API 调用失败，跳过")
+        emit("review", bvid, "failed", elapsed=time.time() - start)
+        return None
+
+    # 生成 Word 文档
+    word_path = generate_word(bvid, reply)
+    print(f"  已生成 Word：{word_path}")
+    emit("review", bvid, "ok", elapsed=time.time() - start, rating=rating)
+    return word_path, rating
+
+def review_task(bvid, title, rating):
+    """读取字幕并审核一个视频（在审核线程中运行），返回 review_one 的结果，失败返回 None"""
+    title = title or "未知标题"  # 结果库中没有标题时（单独运行 step3）设为未知
+    print(f"正在处理 S/A 档视频：{title}")
+    txt_path = os.path.join(SUBTITLE_DIR, f"{bvid}.txt")
+    if not os.path.exists(txt_path):
+        print(f"  字幕文件不存在，跳过")
+        emit("review", bvid, "failed")
+        return None
+    with open(txt_path, "r", encoding="utf-8") as f:
+        subtitle = f.read()
     try:
-        col_rating = headers.index("最终评级") + 1
-    except ValueError:
-        print("Excel 表头缺少最终评级列，无法处理。")
+        return review_one(bvid, title, rating, subtitle)
+    except Exception as e:
+        logging.exception(f"审核 {bvid} 时出错")
+        print(f"  审核 {bvid} 时出错: {e}")
+        emit("review", bvid, "failed")
+        return None
+
+def review_in_order(tasks, concurrency=REVIEW_CONCURRENCY):
+    """
+    用 concurrency 个线程并发审核 tasks 中的 (bvid, 标题, 评级)，按输入顺序产出 (bvid, 结果)。
+    最多提前提交 2 × concurrency 个视频：前面的视频较慢时后面的仍在并发审核，只是结果按顺序交出。
+    """
+    set_concurrency(concurrency)
+    with ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="审核") as pool:
+        window = deque()
+        for task in tasks:
+            window.append((task[0], pool.submit(review_task, *task)))
+            if len(window) >= 2 * max(1, concurrency):
+                bvid, future = window.popleft()
+                yield bvid, future.result()
+        while window:
+            bvid, future = window.popleft()
+            yield bvid, future.result()
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="对 S/A 档视频进行 AI 审核")
+    parser.add_argument("--concurrency", type=int, default=REVIEW_CONCURRENCY,
+                        help=f"同时审核的视频数（默认 {REVIEW_CONCURRENCY}）")
+    parser.add_argument("--rpm", type=float, default=REQUESTS_PER_MINUTE,
+                        help=f"每分钟最多发出的 API 请求数（默认 {REQUESTS_PER_MINUTE}）")
+    parser.add_argument("--no-cache", action="store_true",
+                        help=f"不使用也不更新回复缓存 {RESPONSE_CACHE_FILE}")
+    return parser.parse_args()
+
+def main(concurrency=REVIEW_CONCURRENCY, requests_per_minute=REQUESTS_PER_MINUTE, use_cache=True):
+    force_close_office_apps()   # 在脚本一开始就尝试关闭 Office 进程
+    # 检查结果库是否存在
+    if not os.path.exists(RESULT_DB_PATH):
+        print(f"错误：找不到 {RESULT_DB_PATH}，请先运行评分脚本。")
         return
 
-    # 如果不存在“Word文件”列，则添加
-    col_word = None
-    if "Word文件" not in headers:
-        col_word = len(headers) + 1
-        ws.cell(row=1, column=col_word, value="Word文件")
-    else:
-        col_word = headers.index("Word文件") + 1
-
-    # 遍历数据行（从第二行开始）
-    for row in range(2, ws.max_row + 1):
-        bvid = ws.cell(row=row, column=col_bvid).value
-        if col_title is not None:
-            title = ws.cell(row=row, column=col_title).value
-        else:
-            title = "未知标题"
-        rating = ws.cell(row=row, column=col_rating).value
-
-        # 只处理 S/A 档
-        if not (rating and (rating.startswith('S') or rating.startswith('A'))):
-            continue
-
-        # 如果已生成 Word，跳过
-        if ws.cell(row=row, column=col_word).value:
-            print(f"跳过已处理：{bvid}")
-            continue
-
-        print(f"正在处理 S/A 档视频：{title}")
-        # 读取字幕文件
-        txt_path = os.path.join(SUBTITLE_DIR, f"{bvid}.txt")
-        if not os.path.exists(txt_path):
-            print(f"  字幕文件不存在，跳过")
-            continue
-        with open(txt_path, "r", encoding="utf-8") as f:
-            subtitle = f.read()
-            # ========== 新增：立场检测 ==========
-            stance_prompt = build_stance_check_prompt(title, subtitle)
-            stance_reply = call_deepseek(stance_prompt)
-            if not stance_reply:
-                print(f"  立场检测 API 调用失败，跳过视频 {bvid}")
-                continue
-
-            # 解析立场判断
-            stance_passed = True  # 默认通过
-            if "立场判断：是" in stance_reply:
-                stance_passed = False
-            elif "立场判断：否" in stance_reply:
-                stance_passed = True
-            else:
-                # 未按格式输出，记录警告后视为通过（保守处理）
-                print(f"  警告：立场检测回复格式异常，将按通过处理。回复片段：{stance_reply[:100]}")
-                stance_passed = True
-
-            if not stance_passed:
-                # 立场不正 → 暴力批判模式
-                print(f"  视频 {bvid} 立场不正，启动批判模式...")
-                critique_prompt = build_critique_prompt(title, subtitle)
-                critique_reply = call_deepseek(critique_prompt)
-                if critique_reply:
-                    word_path = generate_word(bvid,critique_reply)
-                    # 更新 Excel：写入 Word 路径，并将评级改为 X
-                    cell = ws.cell(row=row, column=col_word)
-                    cell.value = "打开文档"
-                    cell.hyperlink = os.path.abspath(os.path.join(".", "data", word_path))
-                    cell.font = Font(color="0000FF", underline="single")
-                    ws.cell(row=row, column=col_rating).value = "X"
-                    wb.save(EXCEL_FILE)
-                    print(f"  已生成批判文档，评级改为 X")
-                else:
-                    print(f"  批判生成失败，跳过")
-                continue  # 不再进行正常审核
-            # ========== 立场检测结束 ==========
-        # 根据评级选择提示词
-        if rating.startswith('S'):
-            prompt = build_s_prompt(title, subtitle)
-        else:
-            prompt = build_a_prompt(title, subtitle)
-
-        # 调用 API
-        reply = call_deepseek(prompt)
-        if not reply:
-            print(f"  API 调用失败，跳过")
-            continue
-
-        # 生成 Word 文档
-        word_path = generate_word(bvid, reply)
-        cell = ws.cell(row=row, column=col_word)
-        cell.value = "打开文档"
-        cell.hyperlink = os.path.abspath(os.path.join(".", "data", word_path))
-        cell.font = Font(color="0000FF", underline="single")
-
-        # 立即保存 Excel，避免意外丢失
-        wb.save(EXCEL_FILE)
-        print(f"  已生成 Word：{word_path}")
-
-        # 礼貌延时
-        time.sleep(1)
-    # 备份旧文件（移动原文件）
-    EXCEL_BACKUP_DIR = "./data/excel_backups"
-    os.makedirs(EXCEL_BACKUP_DIR, exist_ok=True)
-    timestamp = time.strftime("%Y%m%d_%H%M")
-    backup_path = os.path.join(EXCEL_BACKUP_DIR, f"{timestamp}.xlsx")
-    os.replace(EXCEL_FILE, backup_path)
-    print(f"旧文件已备份为: {backup_path}")
-    print("AI 审核完成，Excel 已更新。")
+    store = ResultStore()
+    # 待审核的 S/A 档视频（按评分顺序，走 review_status 索引）；已生成 Word 的不会出现在这里
+    pending = store.pending_reviews()
+    done = store.review_counts().get(REVIEW_DONE, 0)
+    if done:
+        print(f"跳过已处理：{done} 个视频已有审核文档")
+    emit("step4", outcome="start", total=len(pending))
+
+    set_rate_limit(requests_per_minute)
+    open_response_cache(use_cache)
+    print(f"待审核 {len(pending)} 个视频，并发 {concurrency}，每分钟最多 {requests_per_minute:g} 次请求")
+    # 审核并发进行，结果按评分顺序逐条写入结果库（只更新这一行），避免意外丢失
+    for bvid, result in review_in_order(pending, concurrency):
+        if result:
+            word_path, final_rating = result
+            store.mark_reviewed(bvid, word_path, final_rating)
+    close_response_cache()
+
+    # 备份上一次导出的 Excel（移动原文件），再由结果库重新导出
+    if os.path.exists(EXCEL_FILE):
+        EXCEL_BACKUP_DIR = "./data/excel_backups"
+        os.makedirs(EXCEL_BACKUP_DIR, exist_ok=True)
+        timestamp = time.strftime("%Y%m%d_%H%M")
+        backup_path = os.path.join(EXCEL_BACKUP_DIR, f"{timestamp}.xlsx")
+        os.replace(EXCEL_FILE, backup_path)
+        print(f"旧文件已备份为: {backup_path}")
+    count, _ = step3_scorer.export_reports(store, EXCEL_FILE)
+    store.close()
+    print(f"AI 审核完成，已导出 {count} 行到 {EXCEL_FILE}。")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    args = parse_args()
+    main(concurrency=args.concurrency, requests_per_minute=args.rpm, use_cache=not args.no_cache)
\ No newline at end of file
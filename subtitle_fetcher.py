@@ -0,0 +1,73 @@
+# subtitle_fetcher.py
+# 获取B站视频自带的字幕（UP主上传的 CC 字幕或平台生成的 AI 字幕）
+
+import requests
+from urllib.parse import urlsplit
+from config import BILIBILI_HEADERS, BILIBILI_API_BASE, BILIBILI_SESSDATA
+
+# 字幕语言优先级：人工上传的中文字幕优先，其次是 AI 中文字幕
+PREFERRED_LANGS = ['zh-CN', 'zh-Hans', 'zh-Hant', 'zh-HK', 'zh-TW', 'zh', 'ai-zh']
+
+
+class SubtitleFetcher:
+    """
+    通过B站接口获取视频自带字幕。
+    api_base 可替换为本地测试服务器地址，session 可替换为自定义的 requests.Session。
+    """
+
+    def __init__(self, api_base=BILIBILI_API_BASE, session=None, timeout=15):
+        self.api_base = api_base.rstrip('/')
+        self.timeout = timeout
+        self.session = session or requests.Session()
+        self.session.headers.update(BILIBILI_HEADERS)
+        if BILIBILI_SESSDATA:
+            self.session.cookies.set('SESSDATA', BILIBILI_SESSDATA)
+
+    def _get_json(self, url, params=None):
+        resp = self.session.get(url, params=params, timeout=self.timeout)
+        resp.raise_for_status()
+        return resp.json()
+
+    def _get_data(self, path, params):
+        result = self._get_json(f"{self.api_base}{path}", params)
+        if result.get('code', 0) != 0:
+            raise RuntimeError(f"{path} 返回错误 {result.get('code')}: {result.get('message')}")
+        return result.get('data') or {}
+
+    def list_tracks(self, bvid):
+        """返回视频的字幕轨道列表 [{lan, lan_doc, subtitle_url}, ...]"""
+        view = self._get_data("/x/web-interface/view", {'bvid': bvid})
+        cid = view.get('cid')
+        if not cid:
+            return []
+        player = self._get_data("/x/player/v2", {'bvid': bvid, 'cid': cid})
+        tracks = (player.get('subtitle') or {}).get('subtitles') or []
+        return [t for t in tracks if t.get('subtitle_url')]
+
+    @staticmethod
+    def choose_track(tracks):
+        """按语言优先级选择字幕轨道；没有中文字幕时返回 None（外语字幕不适用中文评分，改由语音识别）"""
+        if not tracks:
+            return None
+        by_lang = {t.get('lan'): t for t in tracks}
+        for lan in PREFERRED_LANGS:
+            if lan in by_lang:
+                return by_lang[lan]
+        return None
+
+    def fetch(self, bvid):
+        """
+        获取视频自带字幕，返回 (字幕文本, 语言代码)；没有中文字幕轨道时返回 (None, None)。
+        字幕文本与语音识别结果格式一致：各段文字以空格连接。
+        """
+        track = self.choose_track(self.list_tracks(bvid))
+        if track is None:
+            return None, None
+        url = track['subtitle_url']
+        if url.startswith('//'):
+            url = f"{urlsplit(self.api_base).scheme or 'https'}:{url}"  # 协议相对地址沿用接口的协议
+        body = self._get_json(url).get('body') or []
+        text = " ".join(item.get('content', '') for item in body)
+        if not text.strip():
+            return None, None
+        return text, track.get('lan')
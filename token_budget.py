@@ -0,0 +1,79 @@
+# token_budget.py
+# step4 的 token 预算：发送前估算提示词的 token 数，把超出预算的长文案按句切成若干段。
+#   - 配置了 DEEPSEEK_TOKENIZER_FILE（tokenizer.json）且安装了 tokenizers 时用它精确计数；
+#   - 否则按 DeepSeek 文档给出的换算估算：1 个中文字符约 0.6 个 token，1 个英文字符约 0.3 个 token。
+# 估算只用于决定是否分段、每段多长，不要求与计费完全一致。
+
+import re
+import math
+import logging
+import threading
+from config import DEEPSEEK_TOKENIZER_FILE
+
+CJK_TOKENS_PER_CHAR = 0.6
+OTHER_TOKENS_PER_CHAR = 0.3
+CJK_CHAR = re.compile(r'[\u3000-\u303f\u4e00-\u9fff\uff00-\uffef]')
+# 切分单位：以句末标点、换行或空格（step2 用空格连接各识别片段）结尾的一段
+SENTENCE = re.compile(r'[^。！？!?\n ]*[。！？!?\n ]+|[^。！？!?\n ]+$')
+
+_tokenizer = None
+_tokenizer_lock = threading.Lock()
+_tokenizer_failed = False
+
+
+def _get_tokenizer():
+    """按需加载 tokenizer.json；未配置或加载失败时返回 None（只警告一次）"""
+    global _tokenizer, _tokenizer_failed
+    if not DEEPSEEK_TOKENIZER_FILE or _tokenizer_failed:
+        return None
+    with _tokenizer_lock:
+        if _tokenizer is None and not _tokenizer_failed:
+            try:
+                from tokenizers import Tokenizer
+                _tokenizer = Tokenizer.from_file(DEEPSEEK_TOKENIZER_FILE)
+            except Exception as e:
+                logging.warning(f"加载 tokenizer {DEEPSEEK_TOKENIZER_FILE} 失败，改用按字符估算: {e}")
+                _tokenizer_failed = True
+    return _tokenizer
+
+
+def count_tokens(text):
+    """提示词的 token 数（精确计数或估算）"""
+    tokenizer = _get_tokenizer()
+    if tokenizer is not None:
+        return len(tokenizer.encode(text, add_special_tokens=False).ids)
+    cjk = len(CJK_CHAR.findall(text))
+    return math.ceil(cjk * CJK_TOKENS_PER_CHAR + (len(text) - cjk) * OTHER_TOKENS_PER_CHAR)
+
+
+def max_output_chars(max_tokens, headroom=0.8):
+    """max_tokens 个输出 token 大约能写多少个中文字（留出 headroom 余量，避免回复被截断）"""
+    return int(max_tokens * headroom / CJK_TOKENS_PER_CHAR)
+
+
+def split_by_tokens(text, chunk_tokens):
+    """
+    把文本按句切成每段约不超过 chunk_tokens 个 token 的若干段（保持原顺序，拼接后即原文）。
+    单句超长时按估算的字数硬切，切出的各段可能略超出几个 token。
+    """
+    chunks = []
+    current = []
+    current_tokens = 0
+    for sentence in SENTENCE.findall(text):
+        tokens = count_tokens(sentence)
+        if tokens > chunk_tokens:
+            # 超长的一句：先结束当前段，再按估算的字数切开
+            if current:
+                chunks.append("".join(current))
+                current, current_tokens = [], 0
+            step = max(1, int(len(sentence) * chunk_tokens / tokens))
+            chunks.extend(sentence[i:i + step] for i in range(0, len(sentence), step))
+            continue
+        if current and current_tokens + tokens > chunk_tokens:
+            chunks.append("".join(current))
+            current, current_tokens = [], 0
+        current.append(sentence)
+        current_tokens += tokens
+    if current:
+        chunks.append("".join(current))
+    return chunks
@@ -0,0 +1,108 @@
+# tools/bench_audio_formats.py
+# 对比 step2 三种音频获取方式（mp3 / native / pcm）的下载耗时、解码耗时和磁盘占用
+#
+# 用法：
+#   python tools/bench_audio_formats.py                 # 取 data/video_urls.json 前 5 个视频
+#   python tools/bench_audio_formats.py BV1xx BV2xx     # 指定视频
+#   python tools/bench_audio_formats.py -n 10 --transcribe --json bench_audio.json
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+import step2_subtitle_extractor as step2
+from faster_whisper import decode_audio
+
+MODES = ["mp3", "native", "pcm"]
+
+
+def decode(mode, audio_path):
+    """按模式把音频解码为 16kHz float32 数组，返回数组"""
+    if mode == "pcm":
+        return step2.decode_pcm(audio_path)
+    return decode_audio(audio_path, sampling_rate=step2.SAMPLE_RATE)
+
+
+def bench_video(bvid, mode, work_dir, model=None):
+    mode_dir = os.path.join(work_dir, mode)
+    os.makedirs(mode_dir, exist_ok=True)
+
+    start = time.perf_counter()
+    audio_path = step2.download_audio(bvid, mode_dir, audio_format=mode)
+    download_s = time.perf_counter() - start
+    if not audio_path:
+        return None
+
+    start = time.perf_counter()
+    audio = decode(mode, audio_path)
+    decode_s = time.perf_counter() - start
+
+    record = {
+        'bvid': bvid,
+        'mode': mode,
+        'download_s': round(download_s, 3),
+        'decode_s': round(decode_s, 3),
+        'bytes': os.path.getsize(audio_path),
+        'audio_s': round(len(audio) / step2.SAMPLE_RATE, 2)
+    }
+    if model is not None:
+        start = time.perf_counter()
+        segments, _ = model.transcribe(audio, beam_size=5)
+        record['text'] = " ".join(s.text for s in segments)
+        record['transcribe_s'] = round(time.perf_counter() - start, 3)
+    return record
+
+
+def main():
+    parser = argparse.ArgumentParser(description="对比 step2 音频获取方式")
+    parser.add_argument("bvids", nargs="*", help="要测试的 BV 号，默认取 data/video_urls.json")
+    parser.add_argument("-n", type=int, default=5, help="未指定 BV 号时取前 n 个视频")
+    parser.add_argument("--transcribe", action="store_true", help="同时计时语音识别（三种方式使用同一个模型）")
+    parser.add_argument("--json", help="把逐条结果写入该 JSON 文件")
+    args = parser.parse_args()
+
+    bvids = args.bvids
+    if not bvids:
+        with open("./data/video_urls.json", "r", encoding="utf-8") as f:
+            bvids = [v['bvid'] for v in json.load(f)[:args.n]]
+
+    model = step2.load_model(step2.resolve_device_plan(1)) if args.transcribe else None
+    work_dir = tempfile.mkdtemp(prefix="bench_audio_")
+    records = []
+    try:
+        for bvid in bvids:
+            for mode in MODES:
+                record = bench_video(bvid, mode, work_dir, model)
+                if record:
+                    records.append(record)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print(f"\n{'模式':<8}{'视频数':>6}{'下载(s)':>10}{'解码(s)':>10}{'识别(s)':>10}{'磁盘(MB)':>10}")
+    for mode in MODES:
+        rows = [r for r in records if r['mode'] == mode]
+        if not rows:
+            continue
+        transcribe_s = sum(r.get('transcribe_s', 0) for r in rows)
+        print(f"{mode:<8}{len(rows):>6}"
+              f"{sum(r['download_s'] for r in rows):>10.2f}"
+              f"{sum(r['decode_s'] for r in rows):>10.2f}"
+              f"{transcribe_s:>10.2f}"
+              f"{sum(r['bytes'] for r in rows) / 1024 / 1024:>10.2f}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(records, f, ensure_ascii=False, indent=2)
+        print(f"逐条结果已写入 {args.json}")
+
+
+if __name__ == "__main__":
+    main()
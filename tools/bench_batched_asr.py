@@ -0,0 +1,111 @@
+# tools/bench_batched_asr.py
+# 对比 step2 的 sequential 与 batched（VAD + 批量推理）识别方式：记录加速比和词级漂移，
+# 用来决定某个部署是否开启 TRANSCRIBE_MODE = "batched"
+#
+# 用法：
+#   python tools/bench_batched_asr.py                      # 取 data/audios 中前 5 个音频
+#   python tools/bench_batched_asr.py a.m4a b.m4a --batch-size 16 --beam-size 1
+
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import difflib
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+import step2_subtitle_extractor as step2
+
+REPORT_FILE = "./data/asr_mode_report.json"
+
+
+def tokenize(text):
+    """中文按单字、英文和数字按整词切分，作为比较漂移的“词”"""
+    return re.findall(r'[a-zA-Z0-9]+|[^\sa-zA-Z0-9，。！？、,.!?]', text)
+
+
+def word_drift(reference, hypothesis):
+    """以 sequential 结果为基准，按对齐结果统计替换/插入/删除的词数，返回 (编辑数, 基准词数)"""
+    ref, hyp = tokenize(reference), tokenize(hypothesis)
+    edits = 0
+    matcher = difflib.SequenceMatcher(None, ref, hyp, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'replace':
+            edits += max(i2 - i1, j2 - j1)
+        elif tag == 'delete':
+            edits += i2 - i1
+        elif tag == 'insert':
+            edits += j2 - j1
+    return edits, len(ref)
+
+
+def timed_transcribe(model, audio_path, mode):
+    start = time.perf_counter()
+    segments, duration = step2.run_model(model, audio_path, mode=mode)
+    text = " ".join(seg['text'] for seg in segments)  # 分段是惰性生成的，在这里才真正推理
+    return text, duration, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="对比 sequential 与 batched 识别方式")
+    parser.add_argument("audios", nargs="*", help="音频文件，默认取 data/audios 中的前 n 个")
+    parser.add_argument("-n", type=int, default=5)
+    parser.add_argument("--batch-size", type=int, default=step2.BATCH_SIZE)
+    parser.add_argument("--beam-size", type=int, default=step2.BEAM_SIZE)
+    parser.add_argument("--report", default=REPORT_FILE, help="报告输出路径")
+    args = parser.parse_args()
+
+    audios = args.audios
+    if not audios:
+        audios = sorted(
+            os.path.join(step2.AUDIO_DIR, f) for f in os.listdir(step2.AUDIO_DIR)
+            if os.path.splitext(f)[1].lower() in step2.AUDIO_EXTENSIONS
+        )[:args.n]
+    step2.BATCH_SIZE = args.batch_size
+    step2.BEAM_SIZE = args.beam_size
+
+    plan = step2.resolve_device_plan(1)
+    model = step2.load_model(plan)
+    rows = []
+    total_seq = total_bat = 0.0
+    for audio_path in audios:
+        seq_text, duration, seq_s = timed_transcribe(model, audio_path, "sequential")
+        bat_text, _, bat_s = timed_transcribe(model, audio_path, "batched")
+        edits, ref_words = word_drift(seq_text, bat_text)
+        drift = edits / max(ref_words, 1)
+        total_seq += seq_s
+        total_bat += bat_s
+        rows.append({
+            'audio': os.path.basename(audio_path),
+            'audio_s': round(duration, 2),
+            'sequential_s': round(seq_s, 2),
+            'batched_s': round(bat_s, 2),
+            'speedup': round(seq_s / max(bat_s, 1e-6), 2),
+            'word_edits': edits,
+            'reference_words': ref_words,
+            'word_drift': round(drift, 4)
+        })
+        print(f"{rows[-1]['audio']}: 加速 {rows[-1]['speedup']}x，词级漂移 {drift:.2%}")
+
+    report = {
+        'device': plan['device'],
+        'compute_type': plan['compute_type'],
+        'batch_size': args.batch_size,
+        'beam_size': args.beam_size,
+        'speedup': round(total_seq / max(total_bat, 1e-6), 2),
+        'word_drift': round(
+            sum(r['word_edits'] for r in rows) / max(sum(r['reference_words'] for r in rows), 1), 4),
+        'videos': rows
+    }
+    os.makedirs(os.path.dirname(args.report), exist_ok=True)
+    with open(args.report, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n总体加速 {report['speedup']}x，词级漂移 {report['word_drift']:.2%}，报告已写入 {args.report}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+# tools/bench_scorer.py
+# step3 评分器基准测试（完全离线）：
+#   1. 按固定随机种子生成 1k ~ 500k 字的合成中文字幕，词表命中率可控（--hit-rate），
+#      分别计时 calculate_basic_metrics 的各阶段：词表计数、jieba 分词、正则过滤/候选提取、集合构建，以及整体耗时；
+#   2. 在一个字幕目录上计时完整的 step3_scorer.main（不使用评分缓存）。
+# 结果写入 JSON；指定 --baseline 时与之前的结果逐项比较，任一项变慢超过容差即以退出码 1 结束。
+# 基准文件应在同一台机器上生成，不同机器之间的耗时没有可比性。
+#
+# 用法：
+#   python tools/bench_scorer.py                                     # 结果写入 data/bench_scorer.json
+#   python tools/bench_scorer.py --json data/bench_baseline.json     # 生成基准
+#   python tools/bench_scorer.py --baseline data/bench_baseline.json --tolerance 0.2
+#   python tools/bench_scorer.py --sizes 1000,10000 --hit-rate 0.2 --corpus-files 20 --workers 4
+#   python tools/bench_scorer.py --corpus-dir data/subtitles         # 用真实字幕计时 step3 全流程
+
+import os
+import re
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import tempfile
+import contextlib
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+import jieba_cache
+import result_store
+import step3_scorer
+from step3_scorer import VideoScorer, TokenStats
+from config import VIRTUAL_WORDS, LOGIC_WORDS
+
+REPORT_FILE = "./data/bench_scorer.json"
+DEFAULT_SIZES = (1000, 10000, 100000, 500000)
+PHASES = ('lexicon_counts', 'jieba', 'regex', 'sets', 'calculate_basic_metrics')
+
+
+class SegmentRecorder(TokenStats):
+    """沿用 TokenStats 的分块规则，只记录交给 jieba 的各段文本，便于单独计时每个阶段"""
+
+    def __init__(self):
+        super().__init__(set())
+        self.pieces = []
+
+    def _process(self, text):
+        self.pieces.append(text)
+
+
+def synthetic_text(rng, chars, hit_rate, lexicon, filler):
+    """
+    生成约 chars 字的合成字幕：每个“词”以 hit_rate 的概率取自评分词表，否则取自填充词；
+    词之间偶尔插入标点，并像 step2 一样用空格连接各段。
+    """
+    parts = []
+    length = 0
+    since_break = 0
+    while length < chars:
+        word = rng.choice(lexicon) if rng.random() < hit_rate else rng.choice(filler)
+        parts.append(word)
+        length += len(word)
+        since_break += 1
+        if since_break >= rng.randint(6, 20):
+            mark = rng.choice(("，", "。", " ", " "))
+            parts.append(mark)
+            length += 1
+            since_break = 0
+    return "".join(parts)[:chars]
+
+
+def make_vocabulary(rng, size=3000):
+    """由常用汉字区段随机组合出固定的 1~4 字填充词"""
+    hanzi = [chr(0x4e00 + i) for i in range(0, 6000, 3)]
+    return ["".join(rng.choice(hanzi) for _ in range(rng.choice((1, 2, 2, 2, 3, 4)))) for _ in range(size)]
+
+
+def best_of(fn, repeat):
+    """运行 repeat 次，返回 (最短耗时毫秒, 最后一次的返回值)"""
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def bench_phases(scorer, text, repeat):
+    """分别计时 calculate_basic_metrics 的各阶段，返回 {阶段: 毫秒}"""
+    recorder = SegmentRecorder()
+    for i in range(0, len(text), step3_scorer.CHUNK_CHARS):
+        recorder.update(text[i:i + step3_scorer.CHUNK_CHARS])
+    recorder.finish()
+    pieces = recorder.pieces
+
+    timings = {}
+    timings['lexicon_counts'], counts = best_of(lambda: scorer.counter.count(text), repeat)
+    timings['jieba'], words = best_of(lambda: [jieba_cache.lcut(p) for p in pieces], repeat)
+
+    # 与 TokenStats._process 中的正则相同
+    def regex():
+        filtered = [w for ws in words for w in ws if re.match(r'^[\u4e00-\u9fa5a-zA-Z0-9]+$', w)]
+        candidates = [m.group() for p in pieces for m in re.finditer(r'[\u4e00-\u9fa5]{2,}', p)]
+        return filtered, candidates
+    timings['regex'], (filtered, candidates) = best_of(regex, repeat)
+
+    def sets():
+        vocabulary = set(filtered)
+        proper = {c for c in candidates if c not in scorer.exclude_phrases}
+        return len(vocabulary), len(proper)
+    timings['sets'], _ = best_of(sets, repeat)
+    timings['calculate_basic_metrics'], _ = best_of(lambda: scorer.calculate_basic_metrics(text), repeat)
+
+    lexicon_hits = sum(counts.values())
+    return timings, {'words': len(filtered), 'lexicon_hits_per_1k_chars': round(lexicon_hits / len(text) * 1000, 2)}
+
+
+def write_corpus(directory, rng, files, chars, hit_rate, lexicon, filler):
+    os.makedirs(directory, exist_ok=True)
+    for i in range(files):
+        with open(os.path.join(directory, f"BVBENCH{i:05d}.txt"), "w", encoding="utf-8") as f:
+            f.write(synthetic_text(rng, chars, hit_rate, lexicon, filler))
+
+
+def bench_main(corpus_dir, workers, out_dir):
+    """在 corpus_dir 上运行 step3_scorer.main（不读写评分缓存），结果库和导出文件写到 out_dir，返回毫秒"""
+    saved = {name: getattr(step3_scorer, name) for name in
+             ('SUBTITLE_DIR', 'EXCEL_OUTPUT', 'METRICS_CSV_OUTPUT', 'METRICS_PARQUET_OUTPUT', 'force_close_office_apps')}
+    saved_db = result_store.RESULT_DB_PATH
+    db_path = os.path.join(out_dir, "results.db")
+    if os.path.exists(db_path):
+        os.remove(db_path)  # 每次都从空库开始，各次计时可比
+    result_store.RESULT_DB_PATH = db_path
+    step3_scorer.SUBTITLE_DIR = corpus_dir
+    step3_scorer.EXCEL_OUTPUT = os.path.join(out_dir, "video_scores.xlsx")
+    step3_scorer.METRICS_CSV_OUTPUT = os.path.join(out_dir, "video_metrics.csv")
+    step3_scorer.METRICS_PARQUET_OUTPUT = os.path.join(out_dir, "video_metrics.parquet")
+    step3_scorer.force_close_office_apps = lambda: None  # 基准测试不应关闭用户正在使用的 Office
+    try:
+        with open(os.devnull, "w", encoding="utf-8") as devnull, contextlib.redirect_stdout(devnull):
+            start = time.perf_counter()
+            step3_scorer.main(workers=workers, use_cache=False,
+                              export_formats=("csv",))
+            return (time.perf_counter() - start) * 1000
+    finally:
+        for name, value in saved.items():
+            setattr(step3_scorer, name, value)
+        result_store.RESULT_DB_PATH = saved_db
+
+
+def compare(results, baseline, tolerance, min_delta_ms):
+    """返回变慢超过容差的项 [(名称, 基准毫秒, 本次毫秒)]；耗时差小于 min_delta_ms 的视为噪声"""
+    regressions = []
+    for name, ms in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        if ms > base * (1 + tolerance) and ms - base > min_delta_ms:
+            regressions.append((name, base, ms))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="step3 评分器基准测试")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+                        help="合成字幕的字数，逗号分隔")
+    parser.add_argument("--hit-rate", type=float, default=0.05,
+                        help="合成字幕中每个词取自评分词表（虚词、逻辑连词、我、？）的概率")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3, help="每项运行次数，取最短耗时")
+    parser.add_argument("--corpus-dir", help="计时 step3 全流程所用的字幕目录，默认生成合成语料")
+    parser.add_argument("--corpus-files", type=int, default=30, help="合成语料的文件数")
+    parser.add_argument("--corpus-chars", type=int, default=20000, help="合成语料每个文件的字数")
+    parser.add_argument("--workers", type=int, default=1, help="step3 全流程使用的评分进程数")
+    parser.add_argument("--json", default=REPORT_FILE, help="结果输出路径")
+    parser.add_argument("--baseline", help="与之比较的基准结果（之前某次的 --json 输出）")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="允许的变慢比例，默认 0.25 即 25%%")
+    parser.add_argument("--min-delta-ms", type=float, default=1.0, help="耗时差小于该值不算退化（排除计时噪声）")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    scorer = VideoScorer()
+    lexicon = list(VIRTUAL_WORDS) + list(LOGIC_WORDS) + ['我', '？']  # 用列表而非集合，保证语料可复现
+    filler = make_vocabulary(rng)
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+
+    start = time.perf_counter()
+    jieba_cache.get_tokenizer()
+    results = {'jieba_load': (time.perf_counter() - start) * 1000}
+    details = {}
+    for chars in sizes:
+        text = synthetic_text(random.Random(f"{args.seed}-{chars}"), chars, args.hit_rate, lexicon, filler)
+        timings, info = bench_phases(scorer, text, args.repeat)
+        for phase in PHASES:
+            results[f"{chars}/{phase}"] = timings[phase]
+        details[str(chars)] = info
+        print(f"{chars:>7} 字：" + "，".join(f"{p} {timings[p]:.2f} ms" for p in PHASES))
+
+    with tempfile.TemporaryDirectory(prefix="bench_scorer_") as tmp:
+        corpus_dir = args.corpus_dir
+        if not corpus_dir:
+            corpus_dir = os.path.join(tmp, "subtitles")
+            write_corpus(corpus_dir, random.Random(f"{args.seed}-corpus"), args.corpus_files,
+                         args.corpus_chars, args.hit_rate, lexicon, filler)
+        files = sum(1 for f in os.listdir(corpus_dir) if f.endswith(".txt"))
+        best, _ = best_of(lambda: bench_main(corpus_dir, args.workers, tmp), args.repeat)
+        results['step3_main'] = best
+        details['step3_main'] = {'files': files, 'workers': args.workers}
+        print(f"step3 全流程（{files} 个字幕，{args.workers} 个进程）：{best:.1f} ms")
+
+    report = {
+        'config': {
+            'sizes': sizes, 'hit_rate': args.hit_rate, 'seed': args.seed, 'repeat': args.repeat,
+            'corpus_dir': args.corpus_dir, 'corpus_files': args.corpus_files, 'corpus_chars': args.corpus_chars,
+            'workers': args.workers, 'chunk_chars': step3_scorer.CHUNK_CHARS,
+            'python': platform.python_version(), 'machine': platform.machine(), 'platform': platform.platform(),
+        },
+        'results_ms': {k: round(v, 3) for k, v in results.items()},
+        'details': details,
+    }
+    os.makedirs(os.path.dirname(args.json) or ".", exist_ok=True)
+    with open(args.json, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"结果已写入 {args.json}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get('config', {}).get('sizes') != sizes:
+            print("注意：基准与本次的字数设置不同，只比较两者共有的项")
+        regressions = compare(results, baseline.get('results_ms', {}), args.tolerance, args.min_delta_ms)
+        if regressions:
+            print(f"以下各项比基准慢超过 {args.tolerance:.0%}：")
+            for name, base, ms in regressions:
+                print(f"  {name}: {base:.2f} ms -> {ms:.2f} ms（{ms / base - 1:+.0%}）")
+            sys.exit(1)
+        print(f"与基准 {args.baseline} 相比没有超过 {args.tolerance:.0%} 的退化")
+
+
+if __name__ == "__main__":
+    main()
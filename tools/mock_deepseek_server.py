@@ -0,0 +1,262 @@
+# tools/mock_deepseek_server.py
+# 本地模拟的 DeepSeek chat-completions 接口（兼容 OpenAI 格式），用于离线测试 step4 的并发审核：
+#   - HTTP/1.1 长连接；可设置响应延迟、错误率、立场不通过的比例，以及服务端的每分钟请求上限（超出返回 429）；
+#   - GET /stats 返回统计：请求数、新建 TCP 连接数、最大同时处理数、实际每分钟请求数、最大提示词 token 数等。
+# --bench 时在进程内启动服务，用合成视频对比串行与并发审核的耗时，并检查结果顺序、连接复用和限速；
+# 再审核一个超长文案，检查分段摘要后每个提示词都在 token 预算之内。
+#
+# 用法：
+#   python tools/mock_deepseek_server.py --port 18777 --latency 0.5
+#   DEEPSEEK_API_URL=http://127.0.0.1:18777/v1/chat/completions python step4_deepseek_review.py
+#   python tools/mock_deepseek_server.py --bench 40 --concurrency 8 --rpm 600
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+import token_budget
+
+
+class MockStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self.throttled = 0
+        self.connections = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.summaries = 0
+        self.max_prompt_tokens = 0
+        self.times = []  # 每个请求到达的时间
+
+    def snapshot(self):
+        with self.lock:
+            span = self.times[-1] - self.times[0] if len(self.times) > 1 else 0
+            window = [t for t in self.times if t >= self.times[-1] - 60] if self.times else []
+            return {
+                'requests': self.requests,
+                'errors': self.errors,
+                'throttled': self.throttled,
+                'connections': self.connections,
+                'max_in_flight': self.max_in_flight,
+                'summaries': self.summaries,
+                'max_prompt_tokens': self.max_prompt_tokens,
+                'max_requests_per_minute': max_per_minute(self.times),
+                'last_minute_requests': len(window),
+                'span_seconds': round(span, 3),
+            }
+
+
+def max_per_minute(times):
+    """任意 60 秒窗口内的最大请求数"""
+    best = 0
+    left = 0
+    for right, t in enumerate(times):
+        while t - times[left] >= 60:
+            left += 1
+        best = max(best, right - left + 1)
+    return best
+
+
+def make_handler(stats, latency, error_rate, reject_rate, server_rpm, rng):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # 支持长连接，客户端不复用连接时 connections 会随请求数增长
+
+        def setup(self):
+            super().setup()
+            with stats.lock:
+                stats.connections += 1
+
+        def _send(self, code, body, headers=()):
+            data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for key, value in headers:
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path == "/stats":
+                self._send(200, stats.snapshot())
+            else:
+                self._send(404, {'error': 'not found'})
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            now = time.monotonic()
+            with stats.lock:
+                stats.requests += 1
+                stats.times.append(now)
+                recent = sum(1 for t in stats.times if t > now - 60)
+                throttled = server_rpm and recent > server_rpm
+                failed = not throttled and rng.random() < error_rate
+                rejected = rng.random() < reject_rate
+                if throttled:
+                    stats.throttled += 1
+                elif failed:
+                    stats.errors += 1
+                stats.in_flight += 1
+                stats.max_in_flight = max(stats.max_in_flight, stats.in_flight)
+            try:
+                if throttled:
+                    self._send(429, {'error': 'rate limited'}, [("Retry-After", "1")])
+                    return
+                time.sleep(latency * (0.5 + rng.random()))
+                if failed:
+                    self._send(500, {'error': 'mock failure'})
+                    return
+                prompt = body['messages'][0]['content']
+                with stats.lock:
+                    stats.max_prompt_tokens = max(stats.max_prompt_tokens, token_budget.count_tokens(prompt))
+                if "文案整理员" in prompt:
+                    with stats.lock:
+                        stats.summaries += 1
+                    content = "模拟摘要：本段提出观点并以案例论证。" * 20
+                elif "立场审查员" in prompt:
+                    content = "立场判断：是" if rejected else "立场判断：否"
+                elif "是否符合S档" in prompt:
+                    content = "模拟审核意见\n是否符合S档：是"
+                elif "是否符合A档" in prompt:
+                    content = "模拟审核意见\n是否符合A档：是\n具体档次：A(分析)"
+                else:
+                    content = "模拟批判意见"
+                self._send(200, {
+                    'model': body.get('model'),
+                    'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': content},
+                                 'finish_reason': 'stop'}],
+                    'usage': {'prompt_tokens': len(prompt), 'completion_tokens': len(content),
+                              'total_tokens': len(prompt) + len(content)},
+                })
+            finally:
+                with stats.lock:
+                    stats.in_flight -= 1
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def start_server(port=0, latency=0.3, error_rate=0.0, reject_rate=0.0, server_rpm=0, seed=0):
+    """在后台线程启动模拟服务，返回 (server, stats, 接口地址)；port 为 0 时自动选择空闲端口"""
+    stats = MockStats()
+    handler = make_handler(stats, latency, error_rate, reject_rate, server_rpm, random.Random(seed))
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/v1/chat/completions"
+    return server, stats, url
+
+
+def bench(args):
+    """用合成视频分别以并发 1 和 --concurrency 运行 step4 的审核引擎，检查顺序、连接复用和限速"""
+    import step4_deepseek_review as step4
+
+    work = tempfile.mkdtemp(prefix="mock_review_")
+    step4.SUBTITLE_DIR = os.path.join(work, "subtitles")
+    step4.WORD_DIR = os.path.join(work, "word_reviews")
+    os.makedirs(step4.SUBTITLE_DIR)
+    tasks = []
+    for i in range(args.bench):
+        bvid = f"BVMOCK{i:05d}"
+        with open(os.path.join(step4.SUBTITLE_DIR, f"{bvid}.txt"), "w", encoding="utf-8") as f:
+            f.write("模拟字幕内容。" * 200)
+        tasks.append((bvid, f"模拟视频 {i}", "S" if i % 3 == 0 else "A(分析)"))
+
+    report = {}
+    for concurrency in (1, args.concurrency):
+        server, stats, url = start_server(latency=args.latency, error_rate=args.error_rate,
+                                          reject_rate=args.reject_rate, server_rpm=args.server_rpm)
+        step4.DEEPSEEK_API_URL = url
+        step4._session = None  # 每轮使用新的连接池，分别统计连接数
+        step4.set_rate_limit(args.rpm)
+        start = time.perf_counter()
+        order = [bvid for bvid, _ in step4.review_in_order(tasks, concurrency)]
+        elapsed = time.perf_counter() - start
+        server.shutdown()
+        server.server_close()
+        snapshot = stats.snapshot()
+        assert order == [t[0] for t in tasks], "审核结果没有按输入顺序交出"
+        assert snapshot['max_in_flight'] <= concurrency, snapshot
+        # 连接池按并发数确定大小，每个线程最多占用一个长连接，不应再新建连接
+        assert snapshot['connections'] <= concurrency, snapshot
+        assert snapshot['max_requests_per_minute'] <= args.rpm + step4.BURST, snapshot
+        report[concurrency] = dict(snapshot, seconds=round(elapsed, 3))
+        print(f"并发 {concurrency:>2}：{args.bench} 个视频 {elapsed:.2f} 秒，请求 {snapshot['requests']} 次，"
+              f"新建连接 {snapshot['connections']} 个，最大同时请求 {snapshot['max_in_flight']}，"
+              f"限流 {snapshot['throttled']} 次")
+    serial, parallel = report[1]['seconds'], report[args.concurrency]['seconds']
+    print(f"加速比 {serial / parallel:.2f}x；结果顺序、连接复用和每分钟请求数检查均通过")
+    report['long'] = bench_long_transcript(args)
+    return report
+
+
+def bench_long_transcript(args):
+    """审核一个 --long-chars 字的合成长文案：应先分段并发摘要，且发出的每个提示词都不超过预算"""
+    import step4_deepseek_review as step4
+
+    bvid = "BVMOCKLONG"
+    sentence = "这一段讲述了历史事件的来龙去脉，并分析了其中的因果关系。"
+    with open(os.path.join(step4.SUBTITLE_DIR, f"{bvid}.txt"), "w", encoding="utf-8") as f:
+        f.write(sentence * (args.long_chars // len(sentence) + 1))
+    server, stats, url = start_server(latency=args.latency)
+    step4.DEEPSEEK_API_URL = url
+    step4.set_concurrency(1)
+    step4._session = None
+    step4.set_rate_limit(args.rpm)
+    start = time.perf_counter()
+    result = step4.review_task(bvid, "模拟长视频", "S")
+    elapsed = time.perf_counter() - start
+    server.shutdown()
+    server.server_close()
+    snapshot = stats.snapshot()
+    assert result is not None, "长文案审核失败"
+    assert snapshot['summaries'] > 1, snapshot
+    assert snapshot['max_prompt_tokens'] <= step4.PROMPT_TOKEN_BUDGET, snapshot
+    assert snapshot['connections'] <= step4.SUMMARY_CONCURRENCY, snapshot
+    print(f"长文案 {args.long_chars} 字：摘要 {snapshot['summaries']} 段，共请求 {snapshot['requests']} 次，"
+          f"最大提示词约 {snapshot['max_prompt_tokens']} token（预算 {step4.PROMPT_TOKEN_BUDGET}），{elapsed:.2f} 秒")
+    return dict(snapshot, seconds=round(elapsed, 3))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地模拟 DeepSeek chat-completions 接口")
+    parser.add_argument("--port", type=int, default=18777)
+    parser.add_argument("--latency", type=float, default=0.3, help="平均响应延迟（秒），实际在 0.5~1.5 倍之间随机")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="返回 500 的比例")
+    parser.add_argument("--reject-rate", type=float, default=0.0, help="立场检测判为不通过的比例")
+    parser.add_argument("--server-rpm", type=int, default=0, help="服务端每分钟请求上限，超出返回 429（0 表示不限）")
+    parser.add_argument("--bench", type=int, metavar="N", help="不常驻服务，而是用 N 个合成视频测试 step4 的并发审核")
+    parser.add_argument("--concurrency", type=int, default=8, help="--bench 时的并发数")
+    parser.add_argument("--rpm", type=float, default=600, help="--bench 时客户端的每分钟请求上限")
+    parser.add_argument("--long-chars", type=int, default=200000, help="--bench 时长文案测试的字数")
+    args = parser.parse_args()
+
+    if args.bench:
+        bench(args)
+        return
+    server, stats, url = start_server(args.port, args.latency, args.error_rate, args.reject_rate, args.server_rpm)
+    print(f"模拟接口已启动：{url}（统计：http://127.0.0.1:{args.port}/stats），Ctrl+C 结束")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print(json.dumps(stats.snapshot(), ensure_ascii=False, indent=2))
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
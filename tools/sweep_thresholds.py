@@ -0,0 +1,84 @@
+# tools/sweep_thresholds.py
+# 阈值 what-if：读取 step3 的基础指标缓存，批量计算在不同 DECISION_THRESHOLDS 设置下的 S/A/B/C/D 分布，
+# 调整阈值时不必重新运行 step3
+#
+# 用法：
+#   python tools/sweep_thresholds.py                                   # 当前 config 的分布
+#   python tools/sweep_thresholds.py --set S_info_min=40,50,60 --set A_experience_min=20,30
+#   python tools/sweep_thresholds.py --set B_info_low=25,30 --json data/threshold_sweep.json
+
+import os
+import sys
+import json
+import time
+import argparse
+import itertools
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+import batch_rating
+from config import SCORE_WEIGHTS, DECISION_THRESHOLDS
+from step3_scorer import SCORE_CACHE_FILE, SUBTITLE_DIR
+
+
+def load_cached_metrics(path):
+    """读取缓存中字幕文件仍然存在的视频的基础指标"""
+    with open(path, "r", encoding="utf-8") as f:
+        entries = json.load(f).get('entries', {})
+    bvids = sorted(b for b in entries if os.path.exists(os.path.join(SUBTITLE_DIR, f"{b}.txt")))
+    return bvids, [entries[b]['metrics'] for b in bvids]
+
+
+def parse_grid(specs):
+    """把 ["S_info_min=40,50", "A_experience_min=20,30"] 展开为各组合的覆盖项列表"""
+    axes = []
+    for spec in specs:
+        key, _, values = spec.partition("=")
+        if key not in DECISION_THRESHOLDS or not values:
+            raise SystemExit(f"无法识别的阈值设置：{spec}（可用：{', '.join(DECISION_THRESHOLDS)}）")
+        axes.append([(key, float(v)) for v in values.split(",")])
+    return [dict(combo) for combo in itertools.product(*axes)] if axes else [{}]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="批量计算不同评级阈值下的分布")
+    parser.add_argument("--set", action="append", default=[], metavar="KEY=V1,V2,...",
+                        help="要扫描的阈值及取值，可重复；多个阈值取笛卡尔积")
+    parser.add_argument("--cache", default=SCORE_CACHE_FILE, help="基础指标缓存文件（step3 生成）")
+    parser.add_argument("--json", help="把结果另存为 JSON 文件")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.cache):
+        print(f"错误：找不到 {args.cache}，请先运行一次 step3（不要加 --no-cache）。")
+        return
+    bvids, metrics_list = load_cached_metrics(args.cache)
+    if not bvids:
+        print("缓存中没有可用的视频指标。")
+        return
+    grid = parse_grid(args.set)
+
+    start = time.perf_counter()
+    columns = batch_rating.metrics_to_columns(metrics_list)
+    results = batch_rating.sweep(columns, grid, SCORE_WEIGHTS)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+
+    print(f"{len(bvids)} 个视频，{len(grid)} 组阈值设置，耗时 {elapsed_ms:.1f} ms")
+    print(f"{'设置':<40}" + "".join(f"{g:>7}" for g in batch_rating.GRADES))
+    for overrides, dist in results:
+        label = ", ".join(f"{k}={v:g}" for k, v in overrides.items()) or "（当前配置）"
+        print(f"{label:<40}" + "".join(f"{dist[g]:>7}" for g in batch_rating.GRADES))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({
+                'videos': len(bvids),
+                'elapsed_ms': round(elapsed_ms, 3),
+                'results': [{'thresholds': o, 'distribution': d} for o, d in results]
+            }, f, ensure_ascii=False, indent=2)
+        print(f"结果已保存到 {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+# tools/verify_streaming_metrics.py
+# 验证分块/流式计算的基础指标与原始整篇算法完全一致：
+#   原始算法（整篇 jieba.lcut + re.findall + 逐词 str.count） vs calculate_basic_metrics（按块处理）
+#   vs MetricsAccumulator（随机切分后逐段 update）
+#
+# 用法：
+#   python tools/verify_streaming_metrics.py            # 随机合成文本 + data/subtitles 中前 50 个字幕
+#   python tools/verify_streaming_metrics.py --limit 0  # 只用合成文本
+
+import os
+import re
+import sys
+import random
+import argparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+import jieba_cache
+import step3_scorer
+from step3_scorer import VideoScorer, SUBTITLE_DIR
+
+
+def reference_metrics(scorer, text):
+    """改为分块计算之前的整篇算法"""
+    total_chars = len(text)
+    if total_chars == 0:
+        return scorer.metrics_from_counts(0, {}, 0, 0, 0)
+    words = jieba_cache.lcut(text)
+    filtered_words = [w for w in words if re.match(r'^[\u4e00-\u9fa5a-zA-Z0-9]+$', w)]
+    candidates = re.findall(r'[\u4e00-\u9fa5]{2,}', text)
+    proper_candidates = [c for c in candidates if c not in scorer.exclude_phrases]
+    counts = {w: text.count(w) for w in list(scorer.virtual_words) + list(scorer.logic_words) + ['？', '我']}
+    return scorer.metrics_from_counts(
+        total_chars, counts, len(filtered_words), len(set(filtered_words)), len(set(proper_candidates))
+    )
+
+
+def synthetic_texts(rng, count):
+    pieces = ['我', '但是', '然而', '底层逻辑', '本质', '？', '，', '。', ' ', '\n', '\r\n', 'AI', 'GPT-4',
+              '3.5%', '今天', '我们', '讨论', '历史', '经济学', '哲学家', '真相', '不过', '尽管如此']
+    for _ in range(count):
+        yield "".join(rng.choice(pieces) for _ in range(rng.randint(0, 3000)))
+
+
+def random_chunks(rng, text):
+    cuts = sorted(rng.randint(0, len(text)) for _ in range(rng.randint(0, 12)))
+    return [text[a:b] for a, b in zip([0] + cuts, cuts + [len(text)])]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="验证流式基础指标与整篇算法一致")
+    parser.add_argument("--limit", type=int, default=50, help="最多检查多少个真实字幕文件")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    scorer = VideoScorer()
+    texts = list(synthetic_texts(rng, 200))
+    if args.limit and os.path.isdir(SUBTITLE_DIR):
+        for name in sorted(os.listdir(SUBTITLE_DIR))[:args.limit]:
+            if name.endswith(".txt"):
+                with open(os.path.join(SUBTITLE_DIR, name), "r", encoding="utf-8") as f:
+                    texts.append(f.read())
+
+    step3_scorer.CHUNK_CHARS = 257  # 用很小的块，尽量多地制造块边界
+    for text in texts:
+        expected = reference_metrics(scorer, text)
+        assert scorer.calculate_basic_metrics(text) == expected, text[:80]
+        acc = scorer.accumulator()
+        for chunk in random_chunks(rng, text):
+            acc.update(chunk)
+        assert acc.result() == expected, text[:80]
+        assert acc.text_sha256() == step3_scorer.text_sha256(text)
+    print(f"流式基础指标与整篇算法一致（{len(texts)} 篇文本）")
+
+
+if __name__ == "__main__":
+    main()